@@ -1,10 +1,94 @@
+import hashlib
+import threading
+import time
 import jwt
 from django.conf import settings
 from rest_framework import authentication, exceptions
-from collections import namedtuple
+from collections import OrderedDict, namedtuple
 
 SimpleUser = namedtuple("SimpleUser", ["id","username","rol"])
 
+
+class TokenCache:
+    """
+    LRU acotado (``ACCOUNTS_TOKEN_CACHE_SIZE``, 0 = desactivado) de access tokens
+    ya verificados: sha256(token) -> (claims, exp). Una entrada sirve hasta su
+    ``exp``; así las consultas repetidas del Marcador con el mismo token no
+    repiten la firma HMAC ni el parseo. Por proceso.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._items = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def _size(self):
+        return getattr(settings, "ACCOUNTS_TOKEN_CACHE_SIZE", 1024)
+
+    @staticmethod
+    def _key(token):
+        return hashlib.sha256(token.encode("utf-8")).digest()
+
+    def get(self, token):
+        if self._size() <= 0:
+            return None
+        key = self._key(token)
+        with self._lock:
+            item = self._items.get(key)
+            if item is not None and item[1] > time.time():
+                self._items.move_to_end(key)
+                self.hits += 1
+                return item[0]
+            if item is not None:
+                del self._items[key]   # expiró: que jwt.decode dé el error
+            self.misses += 1
+            return None
+
+    def put(self, token, claims):
+        size = self._size()
+        exp = claims.get("exp")
+        if size <= 0 or not isinstance(exp, (int, float)):
+            return
+        key = self._key(token)
+        with self._lock:
+            self._items[key] = (claims, exp)
+            self._items.move_to_end(key)
+            while len(self._items) > size:
+                self._items.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self.hits = self.misses = 0
+
+    def stats(self):
+        with self._lock:
+            return {"size": len(self._items), "max_size": self._size(), "hits": self.hits, "misses": self.misses}
+
+
+token_cache = TokenCache()
+
+
+def decode_access_token(token):
+    """Valida un access token propio y devuelve sus claims (AuthenticationFailed si no sirve)."""
+    data = token_cache.get(token)
+    if data is not None:
+        return dict(data)
+
+    try:
+        data = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.JWT_ALGORITHM])
+    except jwt.ExpiredSignatureError:
+        raise exceptions.AuthenticationFailed("token expirado")
+    except jwt.InvalidTokenError:
+        raise exceptions.AuthenticationFailed("token inválido")
+
+    if data.get("type") != "access":
+        raise exceptions.AuthenticationFailed("token inválido")
+    token_cache.put(token, data)
+    return dict(data)
+
+
 class JWTAuthentication(authentication.BaseAuthentication):
     keyword = "Bearer"
 
@@ -13,14 +97,6 @@ class JWTAuthentication(authentication.BaseAuthentication):
         if not auth or not auth.startswith(self.keyword):
             return None
         token = auth.split(" ", 1)[1].strip()
-        try:
-            data = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.JWT_ALGORITHM])
-        except jwt.ExpiredSignatureError:
-            raise exceptions.AuthenticationFailed("token expirado")
-        except jwt.InvalidTokenError:
-            raise exceptions.AuthenticationFailed("token inválido")
-
-        if data.get("type") != "access":
-            raise exceptions.AuthenticationFailed("token inválido")
+        data = decode_access_token(token)
         user = SimpleUser(id=data.get("sub"), username=data.get("username"), rol=data.get("rol"))
         return (user, None)
@@ -0,0 +1,112 @@
+# accounts/passwords.py
+"""
+Verificación bcrypt del login fuera del hilo de la petición y con concurrencia acotada.
+
+- ``verificar`` ejecuta ``bcrypt.checkpw`` en un ThreadPoolExecutor de
+  ``ACCOUNTS_BCRYPT_WORKERS`` hilos (bcrypt libera el GIL mientras calcula).
+  Así una ráfaga de logins al inicio de turno ocupa como mucho esos hilos de
+  CPU y el resto de la API (marcaciones) sigue atendiendo.
+- Como máximo ``ACCOUNTS_BCRYPT_MAX_PENDING`` verificaciones esperan en cola;
+  si se llena, ``verificar`` lanza ``VerificacionSaturada`` sin calcular nada
+  y la vista responde 503 con ``Retry-After``.
+- Si la clave es correcta y el hash tiene un coste menor que
+  ``ACCOUNTS_BCRYPT_ROUNDS``, devuelve también el hash recalculado para
+  guardarlo (mismo prefijo ``$2y$``/``$2b$`` que el original: la tabla la
+  comparte el ERP en PHP).
+"""
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import bcrypt
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+class VerificacionSaturada(Exception):
+    """La cola de verificaciones bcrypt está llena."""
+
+
+_executor = None
+_executor_lock = threading.Lock()
+_pendientes = 0
+_pendientes_lock = threading.Lock()
+
+
+def workers():
+    return getattr(settings, "ACCOUNTS_BCRYPT_WORKERS", 2)
+
+
+def max_pending():
+    return getattr(settings, "ACCOUNTS_BCRYPT_MAX_PENDING", 32)
+
+
+def rounds():
+    return getattr(settings, "ACCOUNTS_BCRYPT_ROUNDS", None)
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=workers(), thread_name_prefix="bcrypt")
+    return _executor
+
+
+def _coste(hash_bytes):
+    try:
+        return int(hash_bytes.split(b"$")[2])
+    except (IndexError, ValueError):
+        return None
+
+
+def _checkpw(password, hash_bd):
+    """(ok, hash_nuevo | None). Se ejecuta en el pool."""
+    hash_bytes = hash_bd.encode("utf-8")
+    prefijo = hash_bytes[:4]
+    if prefijo == b"$2y$":
+        # PHP usa $2y$; bcrypt de Python sólo acepta $2b$ (mismo algoritmo)
+        hash_bytes = b"$2b$" + hash_bytes[4:]
+
+    clave = password.encode("utf-8")
+    if not bcrypt.checkpw(clave, hash_bytes):
+        return False, None
+
+    objetivo = rounds()
+    coste = _coste(hash_bytes)
+    if not objetivo or coste is None or coste >= objetivo:
+        # sólo se sube el coste: un hash más fuerte que el objetivo se conserva
+        return True, None
+    nuevo = bcrypt.hashpw(clave, bcrypt.gensalt(objetivo))
+    if prefijo == b"$2y$":
+        nuevo = b"$2y$" + nuevo[4:]
+    return True, nuevo.decode("utf-8")
+
+
+def _liberar(_future):
+    global _pendientes
+    with _pendientes_lock:
+        _pendientes -= 1
+
+
+def verificar(password, hash_bd):
+    """
+    Comprueba ``password`` contra ``hash_bd`` en el pool bcrypt.
+    Devuelve ``(ok, hash_nuevo)``; ``hash_nuevo`` es None si no hay que rehashear.
+    Lanza ``VerificacionSaturada`` si ya hay demasiadas verificaciones en curso.
+    """
+    global _pendientes
+    with _pendientes_lock:
+        if _pendientes >= workers() + max_pending():
+            logger.warning("bcrypt: %s verificaciones en curso, se rechaza el login", _pendientes)
+            raise VerificacionSaturada()
+        _pendientes += 1
+    try:
+        future = _get_executor().submit(_checkpw, password or "", hash_bd)
+    except BaseException:
+        _liberar(None)
+        raise
+    future.add_done_callback(_liberar)
+    return future.result()
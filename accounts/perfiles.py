@@ -0,0 +1,197 @@
+# accounts/perfiles.py
+"""
+Perfil ERP de un asesor (nombre, contacto, sede, estado, código de vendedor y
+cargo) resuelto en lote y cacheado.
+
+Para cada id_asesor se guarda una ficha con los datos de ``Asesores`` y todas
+sus filas ``Pri`` (más reciente primero), cada una ya con su ``InfTrab`` y su
+cargo resueltos por subconsultas. Un lote de ids cuesta dos consultas
+(Asesores + Pri anotado), sin importar cuántos sean. Cada llamador elige la fila
+Pri que le corresponde (``id_sede`` / ``estados``) sobre la ficha cacheada
+(``ACCOUNTS_PERFIL_TTL``); ``refrescar=True`` la relee del ERP.
+
+El ERP lo escribe otra aplicación, así que no hay señales: el login (que
+siempre lee del ERP) invalida la ficha del asesor que entra, y
+``POST /api/asesores/`` acepta ``"refrescar": true`` para releer una sede.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import OuterRef, Subquery
+
+from core.caches import ttl
+
+from .models import Asesores, CargosDistritec, InfTrab, Pri
+
+PERFIL_KEY = "accounts:perfil:{}"   # + ID_Asesor
+
+
+def _ttl():
+    # la invalidación del login sólo llega a los demás workers con caché compartida
+    return ttl(getattr(settings, "ACCOUNTS_PERFIL_TTL", 300))
+
+
+def _ficha_vacia(id_asesor):
+    return {
+        "id_asesor": id_asesor, "nombre": None, "correo": None,
+        "cedula": None, "telefono_personal": None, "pris": [],
+    }
+
+
+def _cargar(ids):
+    fichas = {
+        a["ID_Asesor"]: {
+            "id_asesor": a["ID_Asesor"],
+            "nombre": a["Nombre"],
+            "correo": a["Correo"],
+            "cedula": a["Cedula"],
+            "telefono_personal": a["Telefono_personal"],
+            "pris": [],
+        }
+        for a in (Asesores.objects
+                  .filter(ID_Asesor__in=ids)
+                  .values("ID_Asesor", "Nombre", "Correo", "Cedula", "Telefono_personal"))
+    }
+
+    inf = InfTrab.objects.filter(ID_Inf_trab=OuterRef("ID_Inf_trab"))
+    pris = (Pri.objects
+            .filter(ID_Asesor__in=list(ids))
+            .annotate(
+                codigo_vendedor=Subquery(inf.values("Codigo_vendedor")[:1]),
+                cargo_id=Subquery(inf.values("Cargo")[:1]),
+            )
+            .annotate(cargo=Subquery(
+                CargosDistritec.objects.filter(id_cargo=OuterRef("cargo_id")).values("cargo")[:1]
+            ))
+            .order_by("ID_Asesor", "-ID_Pri")
+            .values("ID_Asesor", "ID_Pri", "ID_Estado", "ID_Sede", "ID_Inf_trab",
+                    "codigo_vendedor", "cargo_id", "cargo"))
+    for p in pris:
+        # un asesor con Pri pero sin fila en Asesores también cuenta (datos en None)
+        ficha = fichas.setdefault(p["ID_Asesor"], _ficha_vacia(p["ID_Asesor"]))
+        ficha["pris"].append({
+            "id_pri": p["ID_Pri"],
+            "estado": p["ID_Estado"],
+            "id_sede": p["ID_Sede"],
+            "id_inf_trab": p["ID_Inf_trab"],
+            "codigo_vendedor": p["codigo_vendedor"],
+            "cargo_id": p["cargo_id"],
+            "cargo": p["cargo"],
+        })
+    return fichas
+
+
+def fichas(ids, refrescar=False):
+    """``{id_asesor: ficha}`` de los ids que existen en el ERP (fila en Asesores o en Pri; caché + una carga por lote)."""
+    ids = {int(i) for i in ids if i is not None}
+    if not ids:
+        return {}
+    encontradas = {}
+    if not refrescar:
+        en_cache = cache.get_many([PERFIL_KEY.format(i) for i in ids])
+        encontradas = {f["id_asesor"]: f for f in en_cache.values()}
+    faltan = ids - set(encontradas)
+    if faltan:
+        nuevas = _cargar(faltan)
+        cache.set_many({PERFIL_KEY.format(i): f for i, f in nuevas.items()}, _ttl())
+        encontradas.update(nuevas)
+    return encontradas
+
+
+def _perfil(ficha, id_sede=None, estados=None):
+    """Datos del asesor + su Pri más reciente (opcionalmente en ``id_sede`` y con estado en ``estados``)."""
+    pri = next((
+        p for p in ficha["pris"]
+        if (not id_sede or p["id_sede"] == id_sede)
+        and (estados is None or p["estado"] in estados)
+    ), None) or {}
+    return {
+        "id_asesor": ficha["id_asesor"],
+        "nombre": ficha["nombre"],
+        "correo": ficha["correo"],
+        "cedula": ficha["cedula"],
+        "telefono_personal": ficha["telefono_personal"],
+        "id_sede": pri.get("id_sede"),
+        "estado": pri.get("estado"),
+        "id_pri": pri.get("id_pri"),
+        "id_inf_trab": pri.get("id_inf_trab"),
+        "codigo_vendedor": pri.get("codigo_vendedor"),
+        "cargo_id": pri.get("cargo_id"),
+        "cargo": pri.get("cargo"),
+    }
+
+
+def profiles(ids, id_sede=None, estados=None, refrescar=False):
+    """``{id_asesor: perfil}`` para un lote de ids (los que no existen en el ERP no aparecen)."""
+    return {
+        id_asesor: _perfil(ficha, id_sede=id_sede, estados=estados)
+        for id_asesor, ficha in fichas(ids, refrescar=refrescar).items()
+    }
+
+
+def profile(id_asesor, id_sede=None, estados=None, refrescar=False):
+    """Perfil de un asesor o None si no existe en el ERP."""
+    return profiles([id_asesor], id_sede=id_sede, estados=estados, refrescar=refrescar).get(int(id_asesor))
+
+
+def perfil_login(id_asesor=None, cedula=None):
+    """
+    Perfil para el login, por id_asesor o por cédula, en UNA consulta: Asesores
+    con su último Pri (cualquier estado), InfTrab y cargo como subconsultas.
+    Siempre va al ERP (sin caché): un bloqueo reciente debe aplicarse ya.
+    Devuelve el mismo dict que ``profile`` o None si no existe.
+    """
+    qs = Asesores.objects.all()
+    if id_asesor is not None:
+        qs = qs.filter(ID_Asesor=id_asesor)
+    elif cedula:
+        qs = qs.filter(Cedula=cedula)
+    else:
+        return None
+
+    pri = Pri.objects.filter(ID_Asesor=OuterRef("ID_Asesor")).order_by("-ID_Pri")
+    inf = InfTrab.objects.filter(ID_Inf_trab=OuterRef("pri_inf_trab"))
+    fila = (qs
+            .annotate(
+                pri_id=Subquery(pri.values("ID_Pri")[:1]),
+                pri_estado=Subquery(pri.values("ID_Estado")[:1]),
+                pri_sede=Subquery(pri.values("ID_Sede")[:1]),
+                pri_inf_trab=Subquery(pri.values("ID_Inf_trab")[:1]),
+            )
+            .annotate(
+                codigo_vendedor=Subquery(inf.values("Codigo_vendedor")[:1]),
+                cargo_id=Subquery(inf.values("Cargo")[:1]),
+            )
+            .annotate(cargo=Subquery(
+                CargosDistritec.objects.filter(id_cargo=OuterRef("cargo_id")).values("cargo")[:1]
+            ))
+            .order_by("ID_Asesor")
+            .values("ID_Asesor", "Nombre", "Correo", "Cedula", "Telefono_personal",
+                    "pri_id", "pri_estado", "pri_sede", "pri_inf_trab",
+                    "codigo_vendedor", "cargo_id", "cargo")
+            .first())
+    if fila is None:
+        return None
+    return {
+        "id_asesor": fila["ID_Asesor"],
+        "nombre": fila["Nombre"],
+        "correo": fila["Correo"],
+        "cedula": fila["Cedula"],
+        "telefono_personal": fila["Telefono_personal"],
+        "id_sede": fila["pri_sede"],
+        "estado": fila["pri_estado"],
+        "id_pri": fila["pri_id"],
+        "id_inf_trab": fila["pri_inf_trab"],
+        "codigo_vendedor": fila["codigo_vendedor"],
+        "cargo_id": fila["cargo_id"],
+        "cargo": fila["cargo"],
+    }
+
+
+def ids_de_sede(id_sede):
+    """id_asesor con alguna fila Pri en la sede (candidatos; filtrar por estado con profiles)."""
+    return list(Pri.objects.filter(ID_Sede=id_sede).values_list("ID_Asesor", flat=True).distinct())
+
+
+def invalidar(ids):
+    """Descarta las fichas cacheadas: la próxima lectura va al ERP."""
+    cache.delete_many([PERFIL_KEY.format(int(i)) for i in ids])
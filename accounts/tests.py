@@ -1,3 +1,84 @@
-from django.test import TestCase
+import threading
+from unittest import mock
 
-# Create your tests here.
+import bcrypt
+from django.conf import settings
+from django.test import SimpleTestCase, override_settings
+
+from . import passwords
+from .models import Usuario
+
+
+def _hash(clave, coste, prefijo=b"$2b$"):
+    """Hash bcrypt de ``clave`` con ``coste`` y el prefijo pedido ($2y$ = PHP)."""
+    h = bcrypt.hashpw(clave.encode("utf-8"), bcrypt.gensalt(coste))
+    return (prefijo + h[4:]).decode("utf-8")
+
+
+class VerificarTests(SimpleTestCase):
+    """passwords.verificar: clave, compatibilidad con PHP y rehash sólo hacia arriba."""
+
+    @override_settings(ACCOUNTS_BCRYPT_ROUNDS=5)
+    def test_2y_ida_y_vuelta(self):
+        ok, nuevo = passwords.verificar("secreta", _hash("secreta", 4, b"$2y$"))
+        self.assertTrue(ok)
+        # el rehash conserva el prefijo de PHP y sube al coste objetivo
+        self.assertTrue(nuevo.startswith("$2y$05$"))
+        self.assertEqual(passwords.verificar("secreta", nuevo), (True, None))
+        self.assertEqual(passwords.verificar("otra", nuevo), (False, None))
+
+    def test_rehash_solo_si_el_coste_es_menor(self):
+        h = _hash("secreta", 5)
+        with override_settings(ACCOUNTS_BCRYPT_ROUNDS=4):
+            self.assertEqual(passwords.verificar("secreta", h), (True, None))
+        with override_settings(ACCOUNTS_BCRYPT_ROUNDS=5):
+            self.assertEqual(passwords.verificar("secreta", h), (True, None))
+        with override_settings(ACCOUNTS_BCRYPT_ROUNDS=6):
+            ok, nuevo = passwords.verificar("secreta", h)
+            self.assertTrue(ok)
+            self.assertTrue(nuevo.startswith("$2b$06$"))
+        with override_settings(ACCOUNTS_BCRYPT_ROUNDS=0):
+            self.assertEqual(passwords.verificar("secreta", _hash("secreta", 4)), (True, None))
+
+    def test_clave_incorrecta_no_rehashea(self):
+        with override_settings(ACCOUNTS_BCRYPT_ROUNDS=6):
+            self.assertEqual(passwords.verificar("otra", _hash("secreta", 4)), (False, None))
+
+
+@override_settings(ACCOUNTS_BCRYPT_WORKERS=1, ACCOUNTS_BCRYPT_MAX_PENDING=0)
+class VerificacionSaturadaTests(SimpleTestCase):
+    """Con el pool y la cola llenos el login se rechaza con 503 sin calcular bcrypt."""
+
+    def setUp(self):
+        # una verificación en curso que no termina hasta que el test la suelte
+        self.soltar = threading.Event()
+        self.en_curso = threading.Event()
+
+        def bloqueada(password, hash_bd):
+            self.en_curso.set()
+            self.soltar.wait(5)
+            return False, None
+
+        patcher = mock.patch.object(passwords, "_checkpw", side_effect=bloqueada)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.hilo = threading.Thread(target=passwords.verificar, args=("x", "$2b$04$x"))
+        self.hilo.start()
+        self.addCleanup(self.hilo.join)
+        self.addCleanup(self.soltar.set)
+        self.assertTrue(self.en_curso.wait(5))
+
+    def test_verificar_lanza_saturada(self):
+        with self.assertRaises(passwords.VerificacionSaturada):
+            passwords.verificar("secreta", _hash("secreta", 4))
+
+    def test_login_responde_503(self):
+        usuario = Usuario(id=1, usuario="ana", clave=_hash("secreta", 4))
+        with mock.patch.object(Usuario.objects, "get", return_value=usuario):
+            r = self.client.post(
+                "/api/login/", {"usuario": "ana", "clave": "secreta"},
+                content_type="application/json",
+                headers={"X-Distritec-App": settings.APP_SHARED_SECRET},
+            )
+        self.assertEqual(r.status_code, 503)
+        self.assertEqual(r["Retry-After"], "2")
@@ -1,11 +1,14 @@
-import jwt, datetime
+import jwt, datetime, time
 from django.conf import settings
 
 def _now():
     return datetime.datetime.utcnow()
 
 def make_tokens(payload: dict):
-    # payload mínimo común
+    # payload mínimo común; "sub" siempre como texto (PyJWT >= 2.10 rechaza
+    # al decodificar un sub numérico: "Subject must be a string")
+    if payload.get("sub") is not None:
+        payload = {**payload, "sub": str(payload["sub"])}
     base = {"iat": _now(), "iss": "mi_api"}
     access_payload = {
         **base, **payload,
@@ -20,3 +23,22 @@ def make_tokens(payload: dict):
     access  = jwt.encode(access_payload, settings.SECRET_KEY, algorithm=settings.JWT_ALGORITHM)
     refresh = jwt.encode(refresh_payload, settings.SECRET_KEY, algorithm=settings.JWT_ALGORITHM)
     return access, refresh
+
+
+class Cronometro:
+    """Tiempos por etapa (ms) de una petición; ``server_timing()`` para la cabecera Server-Timing."""
+
+    def __init__(self):
+        self._t = time.perf_counter()
+        self.etapas = {}
+
+    def marcar(self, etapa):
+        ahora = time.perf_counter()
+        self.etapas[etapa] = (ahora - self._t) * 1000
+        self._t = ahora
+
+    def server_timing(self):
+        return ", ".join(f"{etapa};dur={ms:.1f}" for etapa, ms in self.etapas.items())
+
+    def __str__(self):
+        return " ".join(f"{etapa}={ms:.1f}ms" for etapa, ms in self.etapas.items())
@@ -1,16 +1,16 @@
 # accounts/views.py
 import logging
-import bcrypt
 import jwt
 from django.conf import settings
 from rest_framework.views import APIView
 from rest_framework.response import Response
-from .models import Usuario, Asesores, Pri, InfTrab, CargosDistritec
-from .utils import make_tokens
+from .models import Usuario
+from .utils import Cronometro, make_tokens
+from .passwords import VerificacionSaturada, verificar
+from .perfiles import ids_de_sede, invalidar, perfil_login, profiles
 from rest_framework import status
 from django.db.models import Subquery, OuterRef
-from core.dbrouters import InfAsesoresRouter  
-from collections import OrderedDict
+from core.dbrouters import InfAsesoresRouter, solo_lectura
 logger = logging.getLogger(__name__)
 ALLOWED_ESTADOS = {1, 2, 4}
 
@@ -19,6 +19,14 @@ class LoginView(APIView):
     permission_classes = []
 
     def post(self, request):
+        crono = Cronometro()
+        response = self._login(request, crono)
+        # Tiempo por etapa: en el log y en Server-Timing (visible en DevTools)
+        response["Server-Timing"] = crono.server_timing()
+        logger.info(f"Login tiempos: {crono} (status={response.status_code})")
+        return response
+
+    def _login(self, request, crono):
         username = (request.data.get("usuario") or "").strip()
         password = (request.data.get("clave") or "")
         asesor_id_from_body = request.data.get("asesor_id")  # opcional: si lo envías desde el frontend
@@ -34,85 +42,79 @@ class LoginView(APIView):
             logger.info(f"Usuario encontrado: ID={u.id}, usuario={u.usuario}")
         except Usuario.DoesNotExist:
             return Response({"detail": "credenciales inválidas"}, status=401)
+        finally:
+            crono.marcar("usuario")
 
-        # 2) Validar contraseña (bcrypt; normaliza $2y$ → $2b$)
+        # 2) Validar contraseña en el pool bcrypt acotado (accounts.passwords)
         hash_bd = (u.clave or "").strip()
         if not hash_bd:
             return Response({"detail": "credenciales inválidas"}, status=401)
 
-        hash_bd_bytes = hash_bd.encode("utf-8")
-        if hash_bd_bytes.startswith(b"$2y$"):
-            hash_bd_bytes = b"$2b$" + hash_bd_bytes[4:]
-
         try:
-            ok = bcrypt.checkpw((password or "").encode("utf-8"), hash_bd_bytes)
+            ok, hash_nuevo = verificar(password, hash_bd)
+        except VerificacionSaturada:
+            crono.marcar("password")
+            return Response(
+                {"detail": "demasiados inicios de sesión simultáneos, reintenta en unos segundos"},
+                status=503,
+                headers={"Retry-After": "2"},
+            )
         except Exception as e:
             logger.error(f"Error verificando contraseña: {e}")
-            ok = False
+            ok, hash_nuevo = False, None
+        crono.marcar("password")
 
         if not ok:
             return Response({"detail": "credenciales inválidas"}, status=401)
 
-        # 3) Obtener ID_Asesor (SIN FK):
+        if hash_nuevo:
+            # coste menor que ACCOUNTS_BCRYPT_ROUNDS: se guarda el hash recalculado
+            try:
+                Usuario.objects.filter(pk=u.pk, clave=u.clave).update(clave=hash_nuevo)
+                logger.info(f"Clave rehasheada para usuario ID={u.id}")
+            except Exception as e:
+                logger.error(f"No se pudo rehashear la clave de usuario ID={u.id}: {e}")
+
+        # 3) Asesor + perfil ERP en UNA consulta (accounts.perfiles.perfil_login):
         #    a) si te pasan asesor_id (PK lógico de negocio en Asesores.ID_Asesor), úsalo
         #    b) si no, cae a la cédula (Usuario.cedula -> Asesores.Cedula)
-        id_asesor = None
+        #    Se relee en cada login: un bloqueo en el ERP aplica de inmediato.
+        if not asesor_id_from_body and not u.cedula:
+            return Response({"detail": "usuario sin cédula configurada"}, status=403)
+
         if asesor_id_from_body:
-            id_asesor = (
-                Asesores.objects
-                .filter(ID_Asesor=asesor_id_from_body)
-                .values_list("ID_Asesor", flat=True)
-                .first()
-            )
-            if id_asesor:
-                logger.info(f"Asesor por ID_Asesor={asesor_id_from_body}")
-            else:
-                return Response({"detail": "asesor no encontrado"}, status=403)
+            perfil = perfil_login(id_asesor=asesor_id_from_body)
         else:
-            # fallback por cédula
-            if not u.cedula:
-                return Response({"detail": "usuario sin cédula configurada"}, status=403)
-
-            id_asesor = (
-                Asesores.objects
-                .filter(Cedula=u.cedula)
-                .values_list("ID_Asesor", flat=True)
-                .first()
-            )
-            if id_asesor:
-                logger.info(f"Asesor por Cedula={u.cedula} → ID_Asesor={id_asesor}")
-            else:
-                return Response({"detail": "asesor no encontrado"}, status=403)
-
-        #Obtener informacion de la tabla principal
-        pri = Pri.objects.filter(ID_Asesor=id_asesor).order_by("-ID_Pri").first()
-        estado = pri.ID_Estado if pri else None
-
-        #Obtener informacion de trabajo
-        inf_trab = InfTrab.objects.filter(ID_Inf_trab=pri.ID_Inf_trab).order_by("-ID_Inf_trab").first()
-        codigo_vendedor = inf_trab.Codigo_vendedor
-
-        #Obtener cargo
-        cargo_d = CargosDistritec.objects.filter(id_cargo=inf_trab.Cargo).order_by("-id_cargo").first()
-
-        
+            perfil = perfil_login(cedula=u.cedula)
+        crono.marcar("perfil")
+
+        if perfil is None:
+            return Response({"detail": "asesor no encontrado"}, status=403)
+        id_asesor = perfil["id_asesor"]
+        # la ficha cacheada (accounts.perfiles) pudo quedar vieja: que la próxima
+        # lectura vea lo mismo que este login
+        invalidar([id_asesor])
+        logger.info(f"Asesor ID_Asesor={id_asesor} (por {'ID' if asesor_id_from_body else 'Cedula'})")
+
+        estado = perfil["estado"]
         if estado is None:
             return Response({"detail": "usuario sin estado configurado"}, status=403)
         if estado not in ALLOWED_ESTADOS:
             return Response({"detail": "usuario inactivo o bloqueado", "estado": estado}, status=403)
 
-        # 5) Tokens
+        # 4) Tokens
         claims = {
             "sub": u.id,
             "username": u.usuario,
             "nombre": u.nombre,
             "rol": u.rol,
-            "id_sede": pri.ID_Sede,
+            "id_sede": perfil["id_sede"],
             "id_asesor": id_asesor,
-            "codigo_vendedor":codigo_vendedor,
-            "cargo": cargo_d.cargo,
+            "codigo_vendedor": perfil["codigo_vendedor"],
+            "cargo": perfil["cargo"],
         }
         access, refresh = make_tokens(claims)
+        crono.marcar("tokens")
 
         return Response({
             "access": access,
@@ -122,11 +124,11 @@ class LoginView(APIView):
                 "usuario": u.usuario,
                 "nombre": u.nombre,
                 "rol": u.rol,
-                "id_sede": pri.ID_Sede,
+                "id_sede": perfil["id_sede"],
                 "estado": estado,
                 "id_asesor": id_asesor,
-                "codigo_vendedor":codigo_vendedor,
-                "cargo": cargo_d.cargo,
+                "codigo_vendedor": perfil["codigo_vendedor"],
+                "cargo": perfil["cargo"],
         
             }
         }, status=200)
@@ -167,6 +169,7 @@ class RefreshView(APIView):
 
 
 
+@solo_lectura  # consulta por POST: puede leer de la réplica del ERP
 class PersonasPorSedeView(APIView):
     # igual que LoginView, sin auth/perm si lo necesitas público
     authentication_classes = []
@@ -175,6 +178,7 @@ class PersonasPorSedeView(APIView):
     def post(self, request):
         id_sede_raw = (request.data.get("id_sede") or "").strip()
         incluir_usuarios_login = bool(request.data.get("incluir_usuarios_login", False))
+        refrescar = bool(request.data.get("refrescar", False))  # ignora la caché de perfiles
 
         logger.info(f"Consulta personas por sede: id_sede='{id_sede_raw}'")
 
@@ -184,12 +188,7 @@ class PersonasPorSedeView(APIView):
         id_sede = int(id_sede_raw)
 
         # 2) IDs de asesores en esa sede (tabla puente Pri)
-        asesor_ids = (
-            Pri.objects
-            .filter(ID_Sede=id_sede)
-            .values_list("ID_Asesor", flat=True)
-            .distinct()
-        )
+        asesor_ids = ids_de_sede(id_sede)
 
         if not asesor_ids:
             # Sin asesores en la sede; decide si devuelves 200 vacio o 404
@@ -199,71 +198,17 @@ class PersonasPorSedeView(APIView):
                 "asesores": []
             }, status=200)
 
-        asesor_ids = list(asesor_ids)
         logger.info(f"Asesores en sede {id_sede}: {len(asesor_ids)}")
 
 
-        # 3) Último registro Pri por asesor (para traer estado y el ID_Inf_trab asociado)
-        #    Ordenamos por ID_Asesor y -ID_Pri; nos quedamos con el primero de cada asesor
-        pri_rows = (
-            Pri.objects
-            .filter(ID_Asesor__in=asesor_ids, ID_Sede=id_sede)
-            .order_by("ID_Asesor", "-ID_Pri")
-            .values("ID_Asesor", "ID_Pri", "ID_Estado", "ID_Inf_trab", "ID_Sede")
-        )
-
-
-
-
-
-
+        # 3) Perfil de cada asesor con su último Pri en esta sede (accounts.perfiles)
+        perfiles = profiles(asesor_ids, id_sede=id_sede, refrescar=refrescar)
+        resultado = [
+            perfiles[id_asesor] for id_asesor in sorted(perfiles)
+            if perfiles[id_asesor]["estado"] in ALLOWED_ESTADOS
+        ]
 
-        pri_por_asesor = OrderedDict()
-        for row in pri_rows:
-            if row["ID_Asesor"] not in pri_por_asesor:
-                pri_por_asesor[row["ID_Asesor"]] = row
-
-        pri_por_asesor = OrderedDict(
-            (k, v) for k, v in pri_por_asesor.items()
-            if v.get("ID_Estado") in ALLOWED_ESTADOS
-        )
-
-        inf_ids = [r["ID_Inf_trab"] for r in pri_por_asesor.values() if r["ID_Inf_trab"]]
-
-
-
-
-        
-
-
-
-        # 4) Batch de InfTrab y Cargos
-        inf_map = {}
-        if inf_ids:
-            for it in (
-                InfTrab.objects
-                .filter(ID_Inf_trab__in=inf_ids)
-                .values("ID_Inf_trab", "Codigo_vendedor", "Cargo")
-            ):
-                inf_map[it["ID_Inf_trab"]] = it
-
-        cargo_ids = { (inf_map.get(r["ID_Inf_trab"]) or {}).get("Cargo") for r in pri_por_asesor.values() }
-        cargo_ids = {cid for cid in cargo_ids if cid}  # quita None/0
-
-        cargos_map = {}
-        if cargo_ids:
-            for c in CargosDistritec.objects.filter(id_cargo__in=cargo_ids).values("id_cargo", "cargo"):
-                cargos_map[c["id_cargo"]] = c["cargo"]
-
-        # 5) Datos básicos de Asesores
-        asesores_rows = (
-            Asesores.objects
-            .filter(ID_Asesor__in=asesor_ids)
-            .values("ID_Asesor", "Nombre", "Correo", "Cedula", "Telefono_personal")
-        )
-        asesores_map = {a["ID_Asesor"]: a for a in asesores_rows}
-
-        # 6) (Opcional) Usuarios por sede (según usuario_login.ID_Sede)
+        # 4) (Opcional) Usuarios por sede (según usuario_login.ID_Sede)
         usuarios_login = []
         if incluir_usuarios_login:
             usuarios_login = list(
@@ -272,27 +217,6 @@ class PersonasPorSedeView(APIView):
                 .values("id", "nombre", "usuario", "rol", "cedula")
             )
 
-        # 7) Armar respuesta consolidada
-        resultado = []
-        for id_asesor, pri in pri_por_asesor.items():
-            a = asesores_map.get(id_asesor, {})
-            inf = inf_map.get(pri["ID_Inf_trab"]) if pri else None
-            cargo_id = (inf or {}).get("Cargo")
-            resultado.append({
-                "id_asesor": id_asesor,
-                "nombre": a.get("Nombre"),
-                "correo": a.get("Correo"),
-                "cedula": a.get("Cedula"),
-                "telefono_personal": a.get("Telefono_personal"),
-                "id_sede": pri.get("ID_Sede") if pri else id_sede,
-                "estado": pri.get("ID_Estado") if pri else None,
-                "id_pri": pri.get("ID_Pri") if pri else None,
-                "id_inf_trab": pri.get("ID_Inf_trab") if pri else None,
-                "codigo_vendedor": (inf or {}).get("Codigo_vendedor"),
-                "cargo_id": cargo_id,
-                "cargo": cargos_map.get(cargo_id),
-            })
-
         payload = {
             "id_sede": id_sede,
             "total_asesores": len(resultado),
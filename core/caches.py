@@ -0,0 +1,36 @@
+# core/caches.py
+"""
+¿La caché ``default`` la ven todos los procesos?
+
+Con REDIS_URL (o CACHE_REDIS_URL) sí: versiones, invalidaciones y marcas
+sticky que escribe un worker las leen los demás. Sin ella es un LocMemCache
+por proceso y esas señales no salen del worker que las escribe, así que quien
+depende de ellas cae a un modo por tiempo:
+
+- el catálogo EstadoTipo se recarga de la BD cada ``CACHE_LOCAL_MAX_TTL``
+  (workforce/catalogo.py);
+- Asesor, ConfigAsesor y perfiles cacheados duran como mucho
+  ``CACHE_LOCAL_MAX_TTL`` (``ttl``);
+- con réplicas, ``escritura_reciente`` lee siempre del primario
+  (core/dbrouters.py).
+"""
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+
+
+def compartida(alias="default"):
+    """True si la caché ``alias`` la comparten todos los procesos."""
+    return not isinstance(caches[alias], (LocMemCache, DummyCache))
+
+
+def max_ttl_local():
+    return getattr(settings, "CACHE_LOCAL_MAX_TTL", 30)
+
+
+def ttl(segundos, alias="default"):
+    """``segundos`` con caché compartida; acotado a ``CACHE_LOCAL_MAX_TTL`` si es por proceso."""
+    if compartida(alias):
+        return segundos
+    return min(segundos, max_ttl_local())
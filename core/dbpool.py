@@ -0,0 +1,154 @@
+# core/dbpool.py
+"""
+Conexiones a las BD MySQL (``database1`` y ``database_HRS``).
+
+- HTTP bajo WSGI: con ``DB_CONN_MAX_AGE`` > 0 cada hilo del worker conserva su
+  conexión ese tiempo (``CONN_HEALTH_CHECKS`` la verifica antes de reusarla), en
+  vez de abrir dos conexiones nuevas por petición. Bajo ASGI se deja en 0 (por
+  defecto): cada petición síncrona usa un hilo nuevo y no habría reutilización.
+- Consumers de Channels: ``pooled_database_sync_to_async`` ejecuta el trabajo
+  de BD en un ThreadPoolExecutor de ``DATABASE_ASYNC_POOL_SIZE`` hilos. Cada hilo
+  tiene como mucho una conexión por alias, así que el lado async usa como
+  máximo ese número de conexiones por alias; si están todas ocupadas, la
+  llamada espera. Esa espera se mide en ``metrics`` (y se avisa en el log si
+  pasa de ``DATABASE_POOL_WAIT_WARN_MS``).
+  Los hilos del pool son fijos, así que conservan su conexión
+  ``DATABASE_ASYNC_POOL_CONN_MAX_AGE`` segundos aunque ``DB_CONN_MAX_AGE`` sea
+  0: no pasan por ``close_old_connections`` (que con edad 0 la cerraría tras
+  cada llamada) sino por ``close_if_unusable_or_obsolete`` con esa edad propia,
+  y ``CONN_HEALTH_CHECKS`` la verifica antes de reusarla.
+"""
+import functools
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import SyncToAsync
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+logger = logging.getLogger(__name__)
+
+
+class PoolMetrics:
+    """Contadores del pool async (por proceso)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.calls = 0
+            self.in_use = 0
+            self.wait_total = 0.0
+            self.wait_max = 0.0
+
+    def started(self, wait):
+        with self._lock:
+            self.calls += 1
+            self.in_use += 1
+            self.wait_total += wait
+            self.wait_max = max(self.wait_max, wait)
+        if wait * 1000 > getattr(settings, "DATABASE_POOL_WAIT_WARN_MS", 200):
+            logger.warning("Pool BD async: %.0f ms esperando un hilo libre", wait * 1000)
+
+    def finished(self):
+        with self._lock:
+            self.in_use -= 1
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "size": pool_size(),
+                "in_use": self.in_use,
+                "calls": self.calls,
+                "wait_avg_ms": round(self.wait_total / self.calls * 1000, 2) if self.calls else 0.0,
+                "wait_max_ms": round(self.wait_max * 1000, 2),
+            }
+
+
+metrics = PoolMetrics()
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def pool_size():
+    return getattr(settings, "DATABASE_ASYNC_POOL_SIZE", 8)
+
+
+def conn_max_age():
+    return getattr(settings, "DATABASE_ASYNC_POOL_CONN_MAX_AGE", 300)
+
+
+_hilo = threading.local()
+
+
+def _marcar_hilo_del_pool():
+    _hilo.en_pool = True
+
+
+@receiver(connection_created)
+def _edad_en_pool(sender, connection, **kwargs):
+    # en los hilos del pool la conexión vive lo que diga el pool, no CONN_MAX_AGE
+    if getattr(_hilo, "en_pool", False):
+        edad = conn_max_age()
+        connection.close_at = None if edad is None else time.monotonic() + edad
+
+
+def _reciclar_conexiones():
+    """Cierra las conexiones de este hilo que fallaron o superaron su edad."""
+    for conn in connections.all(initialized_only=True):
+        conn.close_if_unusable_or_obsolete()
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=pool_size(), thread_name_prefix="db-pool",
+                    initializer=_marcar_hilo_del_pool,
+                )
+    return _executor
+
+
+def pooled_database_sync_to_async(func):
+    """Como ``database_sync_to_async`` pero en el pool acotado y midiendo la espera."""
+
+    def medido(encolado, *args, **kwargs):
+        metrics.started(time.monotonic() - encolado)
+        _reciclar_conexiones()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            _reciclar_conexiones()
+            metrics.finished()
+
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        ejecutar = SyncToAsync(medido, thread_sensitive=False, executor=_get_executor())
+        return await ejecutar(time.monotonic(), *args, **kwargs)
+
+    return wrapper
+
+
+def stats():
+    """Configuración de conexiones por alias + métricas del pool async."""
+    aliases = {
+        alias: {
+            "conn_max_age": cfg.get("CONN_MAX_AGE", 0),
+            "health_checks": cfg.get("CONN_HEALTH_CHECKS", False),
+        }
+        for alias, cfg in settings.DATABASES.items()
+        if alias != "default"
+    }
+    return {
+        "aliases": aliases,
+        "async_pool": {**metrics.snapshot(), "conn_max_age": conn_max_age()},
+    }
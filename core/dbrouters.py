@@ -1,25 +1,129 @@
 # core/dbrouters.py
+"""
+Routers de las dos BD (ERP ``database1`` y ``database_HRS``).
+
+Réplicas de lectura: ``DATABASE_REPLICAS = {"database_HRS": ["database_HRS_replica"], ...}``
+manda las lecturas a una réplica y las escrituras al primario. Se lee del
+primario cuando:
+- se está dentro de ``usar_primario()`` (el middleware lo activa en POST/PUT/
+  PATCH/DELETE para que las lecturas previas a una escritura no vean datos viejos,
+  salvo en vistas marcadas con ``@solo_lectura``);
+- la consulta sigue una relación de una instancia ya cargada del primario;
+- hubo una escritura reciente sobre la misma clave (``marcar_escritura`` /
+  ``escritura_reciente``, p.e. ``asesor:<id>`` tras una transición), durante
+  ``DATABASE_REPLICA_STICKY_SECONDS``, para leer lo que uno mismo acaba de escribir.
+  La marca vive en la caché ``default``; si es por proceso (sin Redis) otro
+  worker no la vería, así que esas lecturas van siempre al primario.
+"""
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .caches import compartida
+
+STICKY_PREFIX = "db:sticky:"
+
+_usar_primario = ContextVar("usar_primario", default=False)
+
+
+def replicas_de(alias):
+    return getattr(settings, "DATABASE_REPLICAS", {}).get(alias) or []
+
+
+def _hay_replicas():
+    return any(getattr(settings, "DATABASE_REPLICAS", {}).values())
+
+
+def _primario_de(alias):
+    """Alias primario al que pertenece ``alias`` (él mismo si no es réplica)."""
+    for primario, replicas in getattr(settings, "DATABASE_REPLICAS", {}).items():
+        if alias in replicas:
+            return primario
+    return alias
+
+
+@contextmanager
+def usar_primario():
+    """Todas las lecturas de este contexto van al primario."""
+    token = _usar_primario.set(True)
+    try:
+        yield
+    finally:
+        _usar_primario.reset(token)
+
+
+def solo_lectura(view):
+    """
+    Marca una vista (función o clase) que sólo lee aunque se llame por POST:
+    PrimaryForWritesMiddleware no la manda al primario y puede usar réplicas.
+    """
+    view.solo_lectura = True
+    return view
+
+
+def marcar_escritura(clave):
+    """Las lecturas sobre ``clave`` van al primario durante unos segundos."""
+    segundos = getattr(settings, "DATABASE_REPLICA_STICKY_SECONDS", 5)
+    if segundos and _hay_replicas() and compartida():
+        cache.set(f"{STICKY_PREFIX}{clave}", 1, segundos)
 
-class InfAsesoresRouter:
-    # modelos que van a la BD 'database1'
-    route_models = {"usuario", "pri", "asesores", "inftrab", "cargosdistritec"}  # en minúsculas
+
+def escritura_reciente(clave):
+    if not _hay_replicas():
+        return False
+    # sin caché compartida no sabemos qué escribieron los otros workers
+    return not compartida() or bool(cache.get(f"{STICKY_PREFIX}{clave}"))
+
+
+def _lectura(primario, hints):
+    instance = hints.get("instance")
+    if instance is not None and instance._state.db and _primario_de(instance._state.db) == primario:
+        return instance._state.db
+    replicas = replicas_de(primario)
+    if not replicas or _usar_primario.get():
+        return primario
+    return random.choice(replicas)
+
+
+class ReplicaAwareRouter:
+    primario = None
+    route_models = set()
+
+    def _es_nuestro(self, model):
+        return model is not None and model._meta.model_name in self.route_models
 
     def db_for_read(self, model, **hints):
-        return "database1" if model and model._meta.model_name in self.route_models else None
+        return _lectura(self.primario, hints) if self._es_nuestro(model) else None
 
     def db_for_write(self, model, **hints):
-        return "database1" if model and model._meta.model_name in self.route_models else None
+        return self.primario if self._es_nuestro(model) else None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        if self._es_nuestro(type(obj1)) or self._es_nuestro(type(obj2)):
+            if _primario_de(obj1._state.db) == _primario_de(obj2._state.db):
+                return True
+        return None
 
     def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db != _primario_de(db):
+            return False   # las réplicas se replican, no se migran
         if model_name in self.route_models:
-            return db == "database1"
+            return db == self.primario
         return None
 
 
-# core/dbrouters.py
+class InfAsesoresRouter(ReplicaAwareRouter):
+    # modelos que van a la BD 'database1'
+    primario = "database1"
+    route_models = {"usuario", "pri", "asesores", "inftrab", "cargosdistritec"}  # en minúsculas
+
 
-class WorkforceRouter:
-    route_models_hs = {
+class WorkforceRouter(ReplicaAwareRouter):
+    primario = "database_HRS"
+    route_models = {
         "solicitud",
         "asignacionhorario",
         "asesor",
@@ -27,15 +131,5 @@ class WorkforceRouter:
         "estadoconfigasesor",
         "jornadaestado",
         "jornadalaboral",
+        "usodiarioestado",
     }
-
-    def db_for_read(self, model, **hints):
-        return "database_HRS" if model and model._meta.model_name in self.route_models_hs else None
-
-    def db_for_write(self, model, **hints):
-        return "database_HRS" if model and model._meta.model_name in self.route_models_hs else None
-
-    def allow_migrate(self, db, app_label, model_name=None, **hints):
-        if model_name in self.route_models_hs:
-            return db == "database_HRS"
-        return None
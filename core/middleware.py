@@ -2,6 +2,9 @@
 from django.conf import settings
 from django.http import JsonResponse, HttpResponseForbidden, HttpResponse
 import hmac
+from django.urls import Resolver404, resolve
+
+from .dbrouters import usar_primario
 
 
 class AppOnlyMiddleware:
@@ -58,3 +61,32 @@ class AppOnlyMiddleware:
 
     def _is_api_path(self, path):
         return any(path.startswith(prefix) for prefix in self.API_PREFIXES)
+
+
+class PrimaryForWritesMiddleware:
+    """
+    Peticiones que escriben (POST/PUT/PATCH/DELETE) leen del primario: lo que
+    leen antes de escribir no puede venir de una réplica atrasada. Las vistas
+    marcadas con ``@solo_lectura`` (consultas por POST) quedan fuera.
+    """
+
+    SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if request.method in self.SAFE_METHODS or self._solo_lectura(request):
+            return self.get_response(request)
+        with usar_primario():
+            return self.get_response(request)
+
+    @staticmethod
+    def _solo_lectura(request):
+        try:
+            match = resolve(request.path_info, getattr(request, "urlconf", None))
+        except Resolver404:
+            return False
+        # as_view() de Django/DRF expone la clase en view_class
+        vista = getattr(match.func, "view_class", match.func)
+        return getattr(vista, "solo_lectura", False)
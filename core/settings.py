@@ -58,6 +58,7 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
      "django.middleware.security.SecurityMiddleware",
     "whitenoise.middleware.WhiteNoiseMiddleware",
+    "core.middleware.PrimaryForWritesMiddleware",
  
 ]
 
@@ -95,6 +96,14 @@ WSGI_APPLICATION = 'core.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# Conexiones persistentes a MySQL (ver core/dbpool.py). 0 (defecto) = cerrar tras
+# cada petición. Activarlo (p.e. 300, menor que el wait_timeout de MySQL) sólo
+# con workers WSGI (gunicorn core.wsgi), que reutilizan sus hilos. Con ASGI
+# (daphne/uvicorn core.asgi, como está montado HTTP hoy) cada petición síncrona
+# corre en un hilo propio: las conexiones no se reutilizarían y se acumularían
+# hasta el max_connections del servidor.
+DB_CONN_MAX_AGE = int(os.environ.get("DB_CONN_MAX_AGE", "0"))
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
@@ -107,6 +116,9 @@ DATABASES = {
         "PASSWORD": "your_password",
         "HOST": "127.0.0.1",
         "PORT": "3306",
+        "CONN_MAX_AGE": DB_CONN_MAX_AGE,
+        "CONN_HEALTH_CHECKS": True,
+        "OPTIONS": {"connect_timeout": 5},
     },
     "database_HRS": { 
         "ENGINE": "django.db.backends.mysql",
@@ -115,10 +127,38 @@ DATABASES = {
         "PASSWORD": "your_password",
         "HOST": "127.0.0.1",
         "PORT": "3306",
+        "CONN_MAX_AGE": DB_CONN_MAX_AGE,
+        "CONN_HEALTH_CHECKS": True,
+        "OPTIONS": {"connect_timeout": 5},
     },
 }
 
 
+# Réplicas de lectura (opcionales): DATABASE_HRS_REPLICA_HOST / DATABASE1_REPLICA_HOST
+# crean el alias "<bd>_replica" con los mismos datos de conexión y otro host.
+# Los routers mandan ahí las lecturas (ver core/dbrouters.py).
+DATABASE_REPLICAS = {}
+for _alias, _env in (("database_HRS", "DATABASE_HRS_REPLICA_HOST"), ("database1", "DATABASE1_REPLICA_HOST")):
+    if os.environ.get(_env):
+        DATABASES[f"{_alias}_replica"] = {
+            **DATABASES[_alias],
+            "HOST": os.environ[_env],
+            "TEST": {"MIRROR": _alias},
+        }
+        DATABASE_REPLICAS[_alias] = [f"{_alias}_replica"]
+
+# Trabajo de BD de los consumers (core/dbpool.py): hilos = conexiones máximas
+# por alias desde el lado async; se avisa si una llamada espera más de WARN_MS.
+DATABASE_ASYNC_POOL_SIZE = int(os.environ.get("DATABASE_ASYNC_POOL_SIZE", "8"))
+# Los hilos del pool son fijos: conservan su conexión este tiempo (menor que el
+# wait_timeout de MySQL) con independencia de DB_CONN_MAX_AGE.
+DATABASE_ASYNC_POOL_CONN_MAX_AGE = int(os.environ.get("DATABASE_ASYNC_POOL_CONN_MAX_AGE", "300"))
+DATABASE_POOL_WAIT_WARN_MS = 200
+
+# Tras una escritura (p.e. una transición), las lecturas de ese asesor van al
+# primario durante estos segundos (read-your-writes pese al retraso de la réplica).
+DATABASE_REPLICA_STICKY_SECONDS = 5
+
 DATABASE_ROUTERS = [
     "core.dbrouters.InfAsesoresRouter",
     "core.dbrouters.WorkforceRouter",
@@ -221,6 +261,89 @@ FRONTEND_INDEX = BASE_DIR / "static" / "frontend" / "index.html"
 ASGI_APPLICATION = "core.asgi.application"
 CHANNEL_LAYERS = {"default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}}
 
+# --- Despliegue multi-proceso (varios workers Daphne/Uvicorn) ---
+# Con REDIS_URL (p.e. redis://127.0.0.1:6379/0) todos los procesos comparten
+# grupos de líderes (channel layer) y estados de agentes, seq y heartbeats
+# (caché). CHANNELS_REDIS_URL / CACHE_REDIS_URL permiten separar ambos
+# servidores. Sin ninguna variable se queda en memoria local: UN solo proceso.
+REDIS_URL = os.environ.get("REDIS_URL", "")
+CHANNELS_REDIS_URL = os.environ.get("CHANNELS_REDIS_URL", REDIS_URL)
+CACHE_REDIS_URL = os.environ.get("CACHE_REDIS_URL", REDIS_URL)
+
+if CHANNELS_REDIS_URL:
+    CHANNEL_LAYERS = {
+        "default": {
+            "BACKEND": "channels_redis.core.RedisChannelLayer",
+            "CONFIG": {
+                "hosts": [CHANNELS_REDIS_URL],
+                "prefix": "hrs",
+                "capacity": 1500,   # mensajes en cola por canal antes de ChannelFull
+                "expiry": 30,
+                "group_expiry": 86400,
+            },
+        },
+    }
+
+# Alias "realtime": estados en vivo, heartbeats y deltas del WebSocket
+# (workforce/status_store.py, status_stream.py). En memoria local lleva su propio
+# MAX_ENTRIES: con el de Django (300) se descartarían agentes conectados.
+WORKFORCE_REALTIME_CACHE_MAX_ENTRIES = 100000
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+    "realtime": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "workforce-realtime",
+        "OPTIONS": {"MAX_ENTRIES": WORKFORCE_REALTIME_CACHE_MAX_ENTRIES},
+    },
+}
+
+if CACHE_REDIS_URL:
+    # Las claves realtime se guardan sin expiración: con una política
+    # maxmemory volatile-* (o noeviction) Redis nunca las desaloja.
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": CACHE_REDIS_URL,
+            "KEY_PREFIX": "hrs",
+        },
+        "realtime": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": CACHE_REDIS_URL,
+            "KEY_PREFIX": "hrs",
+        },
+    }
+
+# Sin Redis la caché "default" es por proceso: invalidaciones y versiones no
+# llegan a los otros workers, así que lo cacheado dura como mucho esto (y el
+# catálogo de estados se recarga con esta frecuencia). Ver core/caches.py.
+CACHE_LOCAL_MAX_TTL = 30
+
+# Heartbeats del WebSocket (workforce/heartbeats.py)
+WORKFORCE_HEARTBEAT_COALESCE = True       # acumula pings en memoria y los vuelca por lotes
+WORKFORCE_HEARTBEAT_FLUSH_SECONDS = 10    # intervalo de volcado y barrido
+WORKFORCE_HEARTBEAT_STALE_SECONDS = 90    # sin ping en este tiempo → user_disconnected
+
+# Deltas para el panel del líder (workforce/status_stream.py)
+WORKFORCE_STATUS_RING_SIZE = 512          # eventos recuperables con request_all_status?since=
+
+# Ventana de agregación de eventos hacia líderes (workforce/leader_groups.py).
+# 0 (defecto) = un mensaje por evento. Con p.e. 40, los líderes que envían
+# "batch": true en identify_leader reciben un frame estado_batch por ventana.
+WORKFORCE_LEADER_BATCH_MS = 0
+
+# estado_cambio por WebSocket también registra la transición en JornadaEstado
+# (si es False, el agente puede pedirlo por mensaje con "persist": true).
+# Requiere que el cliente se identifique con identify_agent: el Marcador actual
+# envía "identify", así que sus estado_cambio reciben estado_ack ok:false
+# (se siguen difundiendo a los líderes) y no se registra nada.
+WORKFORCE_WS_PERSIST_TRANSITIONS = False
+
+# Cada cuánto un proceso revisa la versión compartida del catálogo EstadoTipo
+# (workforce/catalogo.py) antes de usar su copia en memoria.
+WORKFORCE_CATALOGO_CHECK_SECONDS = 2
+
 
 # Middleware propio
 if "core.middleware.AppOnlyMiddleware" not in MIDDLEWARE:
@@ -262,6 +385,19 @@ JWT_ALGORITHM = "HS256"
 JWT_ACCESS_MINUTES = 30
 JWT_REFRESH_DAYS = 7
 
+# Perfiles ERP cacheados (accounts/perfiles.py), en segundos
+ACCOUNTS_PERFIL_TTL = 300
+
+# Verificación bcrypt del login (accounts/passwords.py): hilos dedicados, cola
+# máxima antes de responder 503, y coste mínimo: tras un login válido se rehashea
+# un hash de coste menor (10 = el de password_hash de PHP; 0 desactiva el rehash)
+ACCOUNTS_BCRYPT_WORKERS = int(os.environ.get("ACCOUNTS_BCRYPT_WORKERS", "2"))
+ACCOUNTS_BCRYPT_MAX_PENDING = int(os.environ.get("ACCOUNTS_BCRYPT_MAX_PENDING", "32"))
+ACCOUNTS_BCRYPT_ROUNDS = int(os.environ.get("ACCOUNTS_BCRYPT_ROUNDS", "10"))
+
+# Access tokens ya verificados por proceso (accounts/auth.py, LRU; 0 lo desactiva)
+ACCOUNTS_TOKEN_CACHE_SIZE = int(os.environ.get("ACCOUNTS_TOKEN_CACHE_SIZE", "1024"))
+
 
 
 
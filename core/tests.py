@@ -0,0 +1,45 @@
+import asyncio
+
+from asgiref.sync import async_to_sync
+from django.db.backends.signals import connection_created
+from django.test import TransactionTestCase, override_settings
+
+from workforce.models import EstadoTipo
+
+from .dbpool import pool_size, pooled_database_sync_to_async
+
+
+@pooled_database_sync_to_async
+def _contar():
+    return EstadoTipo.objects.count()
+
+
+class PoolAsyncConexionesTests(TransactionTestCase):
+    """Los hilos del pool conservan su conexión aunque CONN_MAX_AGE sea 0."""
+    databases = {"default", "database_HRS"}
+
+    def setUp(self):
+        self.creadas = 0
+        connection_created.connect(self._creada)
+        self.addCleanup(connection_created.disconnect, self._creada)
+
+    def _creada(self, sender, connection, **kwargs):
+        if connection.alias == "database_HRS":
+            self.creadas += 1
+
+    def _rafagas(self, n):
+        async def rafaga():
+            return await asyncio.gather(*[_contar() for _ in range(pool_size() * 2)])
+
+        for _ in range(n):
+            async_to_sync(rafaga)()
+
+    @override_settings(DATABASE_ASYNC_POOL_CONN_MAX_AGE=300)
+    def test_reutiliza_una_conexion_por_hilo(self):
+        self._rafagas(4)
+        self.assertLessEqual(self.creadas, pool_size())
+
+    @override_settings(DATABASE_ASYNC_POOL_CONN_MAX_AGE=0)
+    def test_edad_cero_reconecta_en_cada_llamada(self):
+        self._rafagas(2)
+        self.assertEqual(self.creadas, pool_size() * 4)
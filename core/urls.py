@@ -3,10 +3,11 @@ from django.contrib import admin
 from django.urls import path, include, re_path
 from django.conf import settings
 from django.conf.urls.static import static
-from .views import frontend
+from .views import db_pool_stats, frontend
 
 urlpatterns = [
     path("admin/", admin.site.urls),
+    path("api/db-pool/", db_pool_stats, name="db-pool-stats"),
     path("api/", include("accounts.urls")),
     path('api/', include('workforce.urls')),
     re_path(r"^app(?:/.*)?$", frontend),
@@ -1,7 +1,9 @@
 # core/views.py
-from django.http import HttpResponse
+from django.http import HttpResponse, JsonResponse
 from django.conf import settings
 
+from .dbpool import stats
+
 def frontend(request):
     """
     Sirve el index.html del build de React (frontend).
@@ -15,3 +17,8 @@ def frontend(request):
             content_type="text/html",
             status=404,
         )
+
+
+def db_pool_stats(request):
+    """Conexiones por alias y espera del pool async de BD (core/dbpool.py)."""
+    return JsonResponse(stats())
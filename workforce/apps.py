@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class WorkforceConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'workforce'
+
+    def ready(self):
+        # Señales que invalidan las cachés de catálogo
+        from . import catalogo  # noqa: F401
@@ -0,0 +1,135 @@
+# workforce/catalogo.py
+"""
+Caché en memoria del catálogo EstadoTipo (pocas filas, casi nunca cambia).
+
+Cada proceso guarda el catálogo indexado por slug y por id junto con el número
+de versión leído de la caché compartida (``workforce:catalogo_estados:version``).
+Cualquier escritura de EstadoTipo (post_save / post_delete) sube esa versión, y
+cada proceso recarga el catálogo la próxima vez que la consulta (como mucho
+cada ``WORKFORCE_CATALOGO_CHECK_SECONDS``). Si la caché es por proceso (sin
+Redis, ver core/caches.py) la versión no ve las escrituras de los otros
+workers: entonces además se recarga cada ``CACHE_LOCAL_MAX_TTL``.
+
+También invalida la ConfigAsesor cacheada (services.config_asesor) cuando se
+escribe una EstadoConfigAsesor, y el Asesor cacheado (services.asesor_por_id)
+cuando se escribe un Asesor.
+"""
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import router
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from core.caches import compartida, max_ttl_local
+from .models import Asesor, EstadoConfigAsesor, EstadoTipo
+
+VERSION_KEY = "workforce:catalogo_estados:version"
+
+_lock = threading.Lock()
+_catalogo = None       # {"version", "por_slug", "por_id", "ordenados"}
+_revisado_en = 0.0
+
+
+def _check_seconds():
+    return getattr(settings, "WORKFORCE_CATALOGO_CHECK_SECONDS", 2)
+
+
+def _version():
+    cache.add(VERSION_KEY, 1, None)
+    return cache.get(VERSION_KEY) or 1
+
+
+def _cargar(version):
+    # del primario: recién invalidado, una réplica atrasada podría no tener el cambio
+    ordenados = list(EstadoTipo.objects.using(router.db_for_write(EstadoTipo)).order_by("orden", "slug"))
+    return {
+        "version": version,
+        "por_slug": {e.slug: e for e in ordenados},
+        "por_id": {e.id: e for e in ordenados},
+        "ordenados": ordenados,
+        "cargado_en": time.monotonic(),
+    }
+
+
+def _vigente(cat, version, ahora):
+    if cat is None or cat["version"] != version:
+        return False
+    # sin caché compartida la versión sólo cambia con escrituras de este proceso
+    return compartida() or ahora - cat["cargado_en"] < max_ttl_local()
+
+
+def _actual(forzar=False):
+    global _catalogo, _revisado_en
+    ahora = time.monotonic()
+    cat = _catalogo
+    if cat is not None and not forzar and ahora - _revisado_en < _check_seconds():
+        return cat
+    version = _version()
+    if not _vigente(cat, version, ahora):
+        with _lock:
+            if not _vigente(_catalogo, version, ahora):
+                _catalogo = _cargar(version)
+            cat = _catalogo
+    _revisado_en = ahora
+    return cat
+
+
+def invalidar():
+    """Sube la versión compartida y descarta la copia local de este proceso."""
+    global _catalogo
+    cache.add(VERSION_KEY, 1, None)
+    cache.incr(VERSION_KEY)
+    _catalogo = None
+
+
+# ---------------------------------------------------------------------------
+# API pública (las instancias son compartidas: no modificarlas)
+# ---------------------------------------------------------------------------
+
+def _buscar(indice, clave):
+    e = _actual()[indice].get(clave)
+    if e is None:
+        # puede ser un estado recién creado en otro proceso: revisar versión ya
+        e = _actual(forzar=True)[indice].get(clave)
+    return e
+
+
+def estado_por_slug(slug, activo=True):
+    e = _buscar("por_slug", (slug or "").strip().lower())
+    if e is None or (activo and not e.activo):
+        return None
+    return e
+
+
+def estado_por_id(estado_id):
+    return _buscar("por_id", estado_id)
+
+
+def estados_activos():
+    """Estados activos en orden de UI (orden, slug)."""
+    return [e for e in _actual()["ordenados"] if e.activo]
+
+
+@receiver(post_save, sender=EstadoTipo)
+@receiver(post_delete, sender=EstadoTipo)
+def _estado_tipo_cambio(sender, **kwargs):
+    invalidar()
+
+
+@receiver(post_save, sender=EstadoConfigAsesor)
+@receiver(post_delete, sender=EstadoConfigAsesor)
+def _config_asesor_cambio(sender, instance, **kwargs):
+    # 🔽 Importación LOCAL para evitar ciclo (services importa catalogo)
+    from .services import invalidar_config_asesor
+    invalidar_config_asesor(instance.asesor_id)
+
+
+@receiver(post_save, sender=Asesor)
+@receiver(post_delete, sender=Asesor)
+def _asesor_cambio(sender, instance, **kwargs):
+    # 🔽 Importación LOCAL para evitar ciclo (services importa catalogo)
+    from .services import invalidar_asesor
+    invalidar_asesor(instance.id_asesor)
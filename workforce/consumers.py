@@ -1,66 +1,83 @@
 # workforce/consumers.py
-import json
+import logging
+from urllib.parse import parse_qs
 from channels.generic.websocket import AsyncWebsocketConsumer
-from django.core.cache import cache
 from datetime import datetime
+from django.conf import settings
 from django.utils import timezone  # 👈 añadido para timestamps de ping/pong
+from rest_framework import exceptions
 
-STATUS_KEY = "workforce:statuses"  # dict {userId: {...}}
+from core.dbpool import pooled_database_sync_to_async
+from accounts.auth import decode_access_token
+from . import leader_groups, status_store, status_stream
+from .heartbeats import registry as heartbeats
+from .serializers import JornadaEstadoSerializer
+from .services import provisionar_asesor, transicionar_estado
+from .ws_encoding import get_encoding
 
-def _get_all():
-    return cache.get(STATUS_KEY, {})
+logger = logging.getLogger(__name__)
+
+
+@pooled_database_sync_to_async
+def _persistir_transicion(id_asesor, slug, meta):
+    """Igual que POST /asesores/<id>/transiciones/, pero en el pool acotado de BD (core/dbpool.py)."""
+    asesor, _ = provisionar_asesor(id_asesor)
+    j, created = transicionar_estado(asesor, slug, meta)
+    return JornadaEstadoSerializer(j).data, created
 
-def _set_all(data):
-    cache.set(STATUS_KEY, data, None)
 
 class RealtimeConsumer(AsyncWebsocketConsumer):
     async def connect(self):
         self.role = None
         self.userId = None  # 👈 por seguridad
+        self.leader_group = None
+        self.batch_frames = False
+        # json (defecto) | compact | msgpack, ver workforce/ws_encoding.py
+        self.encoding = get_encoding(self._query_param("encoding"))
+        self.scope_sede = None
+        self.scope_area = None
+        heartbeats.ensure_started(self.channel_layer)
         await self.accept()
         # aceptamos la conexión de una vez; el rol se define luego con identify_*
 
     async def disconnect(self, code):
         # Si era un agente, lo quitamos del listado y avisamos a los líderes
         if getattr(self, "userId", None) and self.role == "agent":
-            data = _get_all()
-            if self.userId in data:
-                data.pop(self.userId, None)
-                _set_all(data)
-                await self.channel_layer.group_send(
-                    "leaders",
-                    {
-                        "type": "broadcast.json",
-                        "payload": {
-                            "type": "user_disconnected",
-                            "userId": self.userId,
-                        },
-                    },
-                )
+            heartbeats.forget(self.userId)
+            try:
+                entry = await status_store.aremove_status(self.userId)
+            except status_store.StatusOcupado:
+                # el barrido de heartbeats lo retirará cuando deje de tener señal
+                logger.warning("WS: estado de %s ocupado al desconectar", self.userId)
+                entry = None
+            if entry:
+                await self._broadcast_leaders({
+                    "type": "user_disconnected",
+                    "userId": self.userId,
+                    "id_sede": entry.get("id_sede"),
+                    "area": entry.get("area"),
+                })
 
-        # Si era líder, lo sacamos del grupo de líderes
-        if self.role == "leader":
-            await self.channel_layer.group_discard("leaders", self.channel_name)
+        # Si era líder, lo sacamos de su grupo de líderes
+        if self.role == "leader" and self.leader_group:
+            await self.channel_layer.group_discard(self.leader_group, self.channel_name)
 
     async def receive(self, text_data=None, bytes_data=None):
         try:
-            data = json.loads(text_data or "{}")
+            data = self.encoding.decode(text_data, bytes_data)
         except Exception:
             return
 
         t = data.get("type")
+        if t in ("identify_leader", "identify_agent") and data.get("encoding"):
+            self.encoding = get_encoding(data["encoding"])
 
         # 💓 1) Mantener viva la conexión: manejar "ping" del frontend
         if t == "ping":
-            # Si ya conocemos al agente, podemos actualizar su lastUpdate
+            # Si ya conocemos al agente, registramos su señal de vida
+            # (en modo coalescente se vuelca por lotes, ver workforce/heartbeats.py)
             if self.role == "agent" and self.userId:
-                db = _get_all()
-                cur = db.get(self.userId, {})
-                cur.update({
-                    "lastUpdate": data.get("timestamp") or datetime.utcnow().isoformat()
-                })
-                db[self.userId] = cur
-                _set_all(db)
+                await heartbeats.beat(self.userId, data.get("timestamp"))
 
             # Responder con un "pong" para que el cliente sepa que el WS sigue vivo
             await self.send_json({
@@ -70,9 +87,27 @@ class RealtimeConsumer(AsyncWebsocketConsumer):
             return  # 👈 importante: no seguir procesando este mensaje
 
         # 🧾 2) Identificar líder
+        #    Con token (en el mensaje o en ?token=) el líder queda suscrito sólo
+        #    a su sede (id_sede del JWT) y opcionalmente a un área; sin token,
+        #    o con uno que no se puede validar, entra al grupo global "leaders"
+        #    como antes.
         if t == "identify_leader":
+            token = data.get("token") or self._query_param("token")
+            claims = {}
+            if token:
+                try:
+                    claims = decode_access_token(token)
+                except exceptions.AuthenticationFailed as e:
+                    logger.warning("WS: token de líder no válido (%s), se usa el grupo global", e.detail)
             self.role = "leader"
-            await self.channel_layer.group_add("leaders", self.channel_name)
+            self.batch_frames = bool(data.get("batch"))
+            self.scope_sede = claims.get("id_sede")
+            self.scope_area = (claims.get("area") or data.get("area")) if self.scope_sede else None
+            group = leader_groups.group_name(self.scope_sede, self.scope_area)
+            if self.leader_group and self.leader_group != group:
+                await self.channel_layer.group_discard(self.leader_group, self.channel_name)
+            self.leader_group = group
+            await self.channel_layer.group_add(group, self.channel_name)
             return
 
         # 🧾 3) Identificar agente
@@ -84,54 +119,126 @@ class RealtimeConsumer(AsyncWebsocketConsumer):
                 "nombre": data.get("nombre"),
                 "cargo": data.get("cargo"),
                 "area": data.get("area"),
+                "id_sede": data.get("id_sede"),
                 "estado": "disponible",
                 "lastUpdate": datetime.utcnow().isoformat(),
             }
-            db = _get_all()
-            db[self.userId] = estado
-            _set_all(db)
-            await self._broadcast_all_leaders({"type": "user_connected", **estado})
+            try:
+                await status_store.aset_status(self.userId, estado)
+            except status_store.StatusOcupado:
+                logger.warning("WS: estado de %s ocupado, se ignora identify_agent", self.userId)
+                return
+            await self._broadcast_leaders({"type": "user_connected", **estado})
             return
 
         # 🧾 4) Petición de todos los estados (para panel líder)
+        #    Con "since" (último seq visto) sólo se envían los deltas perdidos;
+        #    si el hueco ya no está en el buffer se manda el snapshot completo.
         elif t == "request_all_status":
-            db = _get_all()
-            await self.send_json({"type": "all_status", "users": list(db.values())})
+            since = data.get("since")
+            if since is not None:
+                try:
+                    since = int(since)
+                except (TypeError, ValueError):
+                    since = None
+            if since is not None:
+                events = await status_stream.adeltas_since(since)
+                if events is not None:
+                    await self.send_json({
+                        "type": "status_deltas",
+                        "since": since,
+                        "seq": events[-1]["seq"] if events else since,
+                        "events": [e for e in events if self._in_scope(e)],
+                    })
+                    return
+            # El seq se lee antes que los estados: el líder puede recibir de
+            # nuevo algún delta ya incluido en el snapshot, pero nunca perderlo.
+            seq = await status_stream.acurrent_seq()
+            users = [u for u in await status_store.aall_statuses() if self._in_scope(u)]
+            await self.send_json({"type": "all_status", "seq": seq, "users": users})
             return
 
         # 🧾 5) Cambio de estado
+        #    Con "persist": true (o WORKFORCE_WS_PERSIST_TRANSITIONS) el agente
+        #    también registra la transición en JornadaEstado y recibe un
+        #    "estado_ack", sin necesidad del POST a /transiciones/. Si no se
+        #    puede registrar, el ack lo indica pero el panel del líder se
+        #    actualiza igual (refleja lo que el agente reporta).
         elif t == "estado_cambio":
             userId = data.get("userId")
-            db = _get_all()
-            cur = db.get(userId, {})
-            cur.update({
-                "userId": userId,
-                "nombre": data.get("nombre", cur.get("nombre")),
-                "cargo": data.get("cargo", cur.get("cargo")),
-                "area": data.get("area", cur.get("area")),
-                "estado": data.get("estado", cur.get("estado", "disponible")),
-                "lastUpdate": data.get("timestamp") or datetime.utcnow().isoformat(),
-            })
-            db[userId] = cur
-            _set_all(db)
-            await self._broadcast_all_leaders({"type": "estado_cambio", **cur})
+            if data.get("persist", getattr(settings, "WORKFORCE_WS_PERSIST_TRANSITIONS", False)):
+                await self._persistir(data)
+            cambios = {k: data[k] for k in ("nombre", "cargo", "area", "id_sede", "estado") if k in data}
+            try:
+                cur = await status_store.aupdate_status(
+                    userId,
+                    defaults={"nombre": None, "cargo": None, "area": None, "id_sede": None, "estado": "disponible"},
+                    userId=userId,
+                    lastUpdate=data.get("timestamp") or datetime.utcnow().isoformat(),
+                    **cambios,
+                )
+            except status_store.StatusOcupado:
+                # el Marcador reenvía su estado periódicamente; no se pisa sin candado
+                logger.warning("WS: estado de %s ocupado, se descarta estado_cambio", userId)
+                return
+            await self._broadcast_leaders({"type": "estado_cambio", **cur})
             return
 
         # Si llega otro tipo que no conocemos, lo ignoramos
         # (puedes loggear si quieres debug)
         # print("Mensaje WS desconocido:", data)
 
-    async def _broadcast_all_leaders(self, payload):
-        await self.channel_layer.group_send(
-            "leaders",
-            {
-                "type": "broadcast.json",
-                "payload": payload,
-            },
-        )
+    async def _persistir(self, data):
+        ack = {"type": "estado_ack", "ref": data.get("ref")}
+        slug = data.get("estado_slug") or data.get("estado")
+        if self.role != "agent" or not self.userId or str(data.get("userId")) != str(self.userId):
+            await self.send_json({**ack, "ok": False, "detail": "agente no identificado"})
+            return
+        if not slug:
+            await self.send_json({**ack, "ok": False, "detail": "estado (slug) requerido"})
+            return
+        meta = {**(data.get("meta") or {}), "origen": data.get("origen") or "ws"}
+        try:
+            jornada, created = await _persistir_transicion(self.userId, slug, meta)
+        except ValueError as e:
+            await self.send_json({**ack, "ok": False, "detail": str(e)})
+            return
+        except Exception:
+            # BD/ERP caídos: no debe tumbar el socket del agente
+            logger.exception("WS: no se pudo registrar la transición de %s a %r", self.userId, slug)
+            await self.send_json({**ack, "ok": False, "detail": "no se pudo registrar la transición"})
+            return
+        await self.send_json({**ack, "ok": True, "created": created, "jornada": jornada})
+
+    async def _broadcast_leaders(self, payload):
+        await leader_groups.broadcast(self.channel_layer, payload)
+
+    def _in_scope(self, agente):
+        return leader_groups.matches(agente, self.scope_sede, self.scope_area)
+
+    def _query_param(self, name):
+        qs = parse_qs(self.scope.get("query_string", b"").decode())
+        return (qs.get(name) or [None])[0]
 
     async def broadcast_json(self, event):
         await self.send_json(event["payload"])
 
+    async def broadcast_batch(self, event):
+        # Líderes que enviaron identify_leader con "batch": true reciben un solo
+        # frame por ventana (último evento por agente); el resto sigue
+        # recibiendo todos los eventos uno a uno.
+        events = event["events"]
+        if self.batch_frames:
+            events = leader_groups.collapse(events)
+            await self.send_json({
+                "type": "estado_batch",
+                "seq": max(e.get("seq", 0) for e in events),
+                "events": events,
+            })
+            return
+        for e in events:
+            await self.send_json(e)
+
     async def send_json(self, obj):
-        await self.send(text_data=json.dumps(obj))
+        text_data, bytes_data = self.encoding.encode(obj)
+        await self.send(text_data=text_data, bytes_data=bytes_data)
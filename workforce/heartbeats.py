@@ -0,0 +1,116 @@
+# workforce/heartbeats.py
+"""
+Heartbeats de los agentes conectados al RealtimeConsumer.
+
+En modo coalescente (``WORKFORCE_HEARTBEAT_COALESCE``) cada ``ping`` sólo anota
+la hora en memoria del proceso; una tarea de fondo vuelca todos los pings
+pendientes al status_store en un único ``set_many`` cada
+``WORKFORCE_HEARTBEAT_FLUSH_SECONDS``. La misma tarea barre a los agentes que
+llevan más de ``WORKFORCE_HEARTBEAT_STALE_SECONDS`` sin señal de vida y avisa a
+los líderes de su sede con ``user_disconnected``, aunque ``disconnect()`` nunca
+se ejecute (pestaña congelada, proceso caído, red cortada).
+"""
+import asyncio
+import logging
+import time
+from datetime import datetime
+
+from django.conf import settings
+
+from . import leader_groups, status_store
+
+logger = logging.getLogger(__name__)
+
+
+def coalesce_enabled():
+    return getattr(settings, "WORKFORCE_HEARTBEAT_COALESCE", True)
+
+
+def flush_interval():
+    return getattr(settings, "WORKFORCE_HEARTBEAT_FLUSH_SECONDS", 10)
+
+
+def stale_after():
+    return getattr(settings, "WORKFORCE_HEARTBEAT_STALE_SECONDS", 90)
+
+
+class HeartbeatRegistry:
+    """Pings pendientes de este proceso + tarea de volcado/barrido."""
+
+    def __init__(self):
+        self._pending = {}   # userId (str) -> iso del último ping
+        self._task = None
+        self._channel_layer = None
+
+    # ---------------------------------------------------------------
+    # Registro de pings
+    # ---------------------------------------------------------------
+    async def beat(self, user_id, timestamp=None):
+        iso = timestamp or datetime.utcnow().isoformat()
+        if coalesce_enabled():
+            self._pending[str(user_id)] = iso
+        else:
+            await status_store.atouch_many({user_id: iso})
+
+    def forget(self, user_id):
+        self._pending.pop(str(user_id), None)
+
+    async def flush(self):
+        """Vuelca los pings acumulados en un solo lote. Devuelve cuántos escribió."""
+        if not self._pending:
+            return 0
+        batch, self._pending = self._pending, {}
+        await status_store.atouch_many(batch)
+        return len(batch)
+
+    # ---------------------------------------------------------------
+    # Barrido de agentes sin señal de vida
+    # ---------------------------------------------------------------
+    async def sweep(self):
+        limite = stale_after()
+        if not limite or self._channel_layer is None:
+            return []
+        removed = []
+        for uid in await status_store.astale_user_ids(time.time() - limite):
+            if uid in self._pending:
+                continue  # tenemos un ping que aún no se volcó
+            try:
+                entry = await status_store.aremove_status(uid)
+            except status_store.StatusOcupado:
+                continue  # se está escribiendo ahora: el próximo barrido decide
+            if not entry:
+                continue  # otro proceso ya lo retiró
+            user_id = entry.get("userId", uid)
+            removed.append(user_id)
+            await leader_groups.broadcast(self._channel_layer, {
+                "type": "user_disconnected",
+                "userId": user_id,
+                "id_sede": entry.get("id_sede"),
+                "area": entry.get("area"),
+                "reason": "stale",
+            })
+        if removed:
+            logger.info("Heartbeats: %s agentes sin señal retirados", len(removed))
+        return removed
+
+    # ---------------------------------------------------------------
+    # Tarea de fondo (una por proceso / event loop)
+    # ---------------------------------------------------------------
+    def ensure_started(self, channel_layer):
+        self._channel_layer = channel_layer
+        loop = asyncio.get_running_loop()
+        if self._task is not None and not self._task.done() and self._task.get_loop() is loop:
+            return
+        self._task = loop.create_task(self._run())
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(flush_interval())
+            try:
+                await self.flush()
+                await self.sweep()
+            except Exception:
+                logger.exception("Heartbeats: error en volcado/barrido")
+
+
+registry = HeartbeatRegistry()
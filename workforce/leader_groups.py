@@ -0,0 +1,142 @@
+# workforce/leader_groups.py
+"""
+Grupos de líderes por suscripción.
+
+Un líder sin alcance (sin ``id_sede`` en su JWT) sigue en el grupo global
+``leaders`` y recibe todo. Un líder con sede entra sólo en
+``leaders.sede.<id>`` o, si además filtra por área, en
+``leaders.sede.<id>.area.<area>``. Cada evento de un agente se envía al grupo
+global y a los grupos de su sede/área, de modo que un líder no recibe tráfico
+de sedes que no le corresponden.
+
+Con ``WORKFORCE_LEADER_BATCH_MS`` > 0 (por defecto 0: desactivado) los eventos
+se agrupan durante esa ventana y cada grupo recibe un solo mensaje
+``broadcast.batch`` con todos ellos en orden. El consumer lo entrega como un
+frame ``estado_batch`` (último evento por userId gana, ver ``collapse``) a los
+líderes que lo pidieron y como los mismos eventos sueltos, sin descartar
+ninguno, al resto.
+"""
+import asyncio
+import logging
+
+from django.conf import settings
+from django.utils.text import slugify
+
+from . import status_stream
+
+logger = logging.getLogger(__name__)
+
+LEADERS_GROUP = "leaders"
+MAX_GROUP_LEN = 99   # límite de nombres de grupo en Channels
+
+
+def batch_window():
+    """Ventana de agregación en segundos (0 = envío inmediato)."""
+    return (getattr(settings, "WORKFORCE_LEADER_BATCH_MS", 0) or 0) / 1000.0
+
+
+def _area_slug(area):
+    return slugify(str(area or ""))[:40]
+
+
+def group_name(id_sede=None, area=None):
+    """Grupo al que se une un líder según su alcance."""
+    if id_sede in (None, ""):
+        return LEADERS_GROUP
+    name = f"{LEADERS_GROUP}.sede.{slugify(str(id_sede))}"
+    area_slug = _area_slug(area)
+    if area_slug:
+        name = f"{name}.area.{area_slug}"
+    return name[:MAX_GROUP_LEN]
+
+
+def groups_for_agent(agente):
+    """Grupos que deben recibir los eventos de un agente (dict del status_store)."""
+    agente = agente or {}
+    id_sede = agente.get("id_sede")
+    groups = [LEADERS_GROUP]
+    if id_sede not in (None, ""):
+        groups.append(group_name(id_sede))
+        if _area_slug(agente.get("area")):
+            groups.append(group_name(id_sede, agente.get("area")))
+    return groups
+
+
+def matches(agente, id_sede=None, area=None):
+    """True si el agente cae dentro del alcance del líder (para snapshots y deltas)."""
+    if id_sede in (None, ""):
+        return True
+    if str(agente.get("id_sede")) != str(id_sede):
+        return False
+    area_slug = _area_slug(area)
+    return not area_slug or _area_slug(agente.get("area")) == area_slug
+
+
+def collapse(events):
+    """Último evento por userId, en el orden de su última aparición."""
+    ultimos = {}
+    for event in events:
+        key = str(event.get("userId"))
+        ultimos.pop(key, None)
+        ultimos[key] = event
+    return list(ultimos.values())
+
+
+class BroadcastBatcher:
+    """Eventos pendientes por grupo dentro de la ventana actual (uno por proceso)."""
+
+    def __init__(self):
+        self._pending = {}   # group -> [event, ...]
+        self._task = None
+        self._channel_layer = None
+
+    def add(self, channel_layer, groups, event):
+        self._channel_layer = channel_layer
+        for group in groups:
+            self._pending.setdefault(group, []).append(event)
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._flush_later())
+
+    async def _flush_later(self):
+        await asyncio.sleep(batch_window())
+        # Lo que llegue mientras se envía este lote abre una ventana nueva
+        self._task = None
+        try:
+            await self.flush()
+        except Exception:
+            logger.exception("Broadcast: error enviando lote a líderes")
+
+    async def flush(self):
+        pending, self._pending = self._pending, {}
+        for group, eventos in pending.items():
+            await self._channel_layer.group_send(
+                group,
+                {
+                    "type": "broadcast.batch",
+                    "events": eventos,
+                },
+            )
+
+
+batcher = BroadcastBatcher()
+
+
+async def broadcast(channel_layer, payload, agente=None):
+    """
+    Numera el evento en el status_stream y lo envía a los grupos del agente.
+    ``agente`` aporta id_sede/area cuando el payload no los trae.
+    """
+    event = await status_stream.arecord(payload)
+    groups = groups_for_agent(agente or payload)
+    if batch_window() > 0:
+        batcher.add(channel_layer, groups, event)
+        return event
+    for group in groups:
+        await channel_layer.group_send(
+            group,
+            {
+                "type": "broadcast.json",
+                "payload": event,
+            },
+        )
+    return event
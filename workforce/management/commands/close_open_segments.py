@@ -0,0 +1,35 @@
+# workforce/management/commands/close_open_segments.py
+from datetime import datetime, time
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from workforce.models import JornadaEstado
+from workforce.services import cerrar_tramos_abiertos
+
+
+class Command(BaseCommand):
+    help = (
+        "Cierra en lotes los tramos de JornadaEstado que quedaron abiertos. Por defecto "
+        "sólo los que empezaron antes de hoy (cada uno al final de su día); con "
+        "--incluir-hoy también los de hoy (barrido de fin de turno, cierran ahora)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--incluir-hoy", action="store_true", help="Cerrar también los tramos abiertos hoy")
+        parser.add_argument("--batch", type=int, default=500, help="Tramos por lote/transacción (por defecto 500)")
+        parser.add_argument("--dry-run", action="store_true", help="Sólo contar, sin cerrar nada")
+
+    def handle(self, *args, **opts):
+        if opts["incluir_hoy"]:
+            antes_de = timezone.now()
+        else:
+            antes_de = timezone.make_aware(datetime.combine(timezone.localdate(), time.min))
+
+        if opts["dry_run"]:
+            n = JornadaEstado.objects.filter(fin__isnull=True, inicio__lt=antes_de).count()
+            self.stdout.write(f"{n} tramos abiertos antes de {antes_de:%Y-%m-%d %H:%M}")
+            return
+
+        cerrados = cerrar_tramos_abiertos(antes_de, batch_size=max(1, opts["batch"]))
+        self.stdout.write(self.style.SUCCESS(f"Tramos cerrados: {cerrados}"))
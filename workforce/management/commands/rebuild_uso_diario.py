@@ -0,0 +1,40 @@
+# workforce/management/commands/rebuild_uso_diario.py
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from workforce.models import Asesor
+from workforce.services import reconstruir_uso_diario
+
+
+class Command(BaseCommand):
+    help = (
+        "Reconstruye el acumulado diario (UsoDiarioEstado) desde los tramos cerrados "
+        "de JornadaEstado. Por defecto: los últimos 30 días."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--desde", help="Fecha inicial YYYY-MM-DD (incluida)")
+        parser.add_argument("--hasta", help="Fecha final YYYY-MM-DD (incluida, por defecto hoy)")
+        parser.add_argument("--asesor", type=int, help="id_asesor (ERP) para limitar la reconstrucción")
+
+    def handle(self, *args, **opts):
+        try:
+            hasta = date.fromisoformat(opts["hasta"]) if opts["hasta"] else timezone.localdate()
+            desde = date.fromisoformat(opts["desde"]) if opts["desde"] else hasta - timedelta(days=29)
+        except ValueError:
+            raise CommandError("Las fechas deben tener formato YYYY-MM-DD")
+        if desde > hasta:
+            raise CommandError("--desde no puede ser posterior a --hasta")
+
+        asesor = None
+        if opts["asesor"] is not None:
+            asesor = Asesor.objects.filter(id_asesor=opts["asesor"]).first()
+            if not asesor:
+                raise CommandError(f"Asesor {opts['asesor']} no existe")
+
+        filas = reconstruir_uso_diario(desde, hasta, asesor=asesor)
+        self.stdout.write(self.style.SUCCESS(
+            f"UsoDiarioEstado reconstruido {desde} → {hasta}: {filas} filas"
+        ))
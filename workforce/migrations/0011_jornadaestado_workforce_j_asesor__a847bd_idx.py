@@ -0,0 +1,17 @@
+# Generated by Django 5.2.7 on 2026-10-18 09:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('workforce', '0010_jornadalaboral'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='jornadaestado',
+            index=models.Index(fields=['asesor', 'estado', 'inicio'], name='workforce_j_asesor__a847bd_idx'),
+        ),
+    ]
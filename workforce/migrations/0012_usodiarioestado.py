@@ -0,0 +1,76 @@
+# Generated by Django 5.2.7 on 2026-10-18 09:34
+
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.utils import timezone
+
+# Días (hasta hoy incluido) que se rellenan al crear la tabla, como el valor
+# por defecto de ``manage.py rebuild_uso_diario``; los anteriores con el comando.
+DIAS_RELLENO = 30
+
+
+def rellenar_uso_diario(apps, schema_editor):
+    """
+    Rellena UsoDiarioEstado desde los tramos cerrados de JornadaEstado para que
+    ``segundos_hoy`` (que ya no suma los tramos cerrados) no empiece en cero.
+    Mismo reparto que ``services.acumular_uso_diario``: cada tramo se parte por
+    días locales y cuenta una transición en el día en que empieza.
+    """
+    JornadaEstado = apps.get_model("workforce", "JornadaEstado")
+    UsoDiarioEstado = apps.get_model("workforce", "UsoDiarioEstado")
+    db = schema_editor.connection.alias
+
+    hasta = timezone.localdate()
+    desde = hasta - timedelta(days=DIAS_RELLENO - 1)
+    desde_dt = timezone.make_aware(datetime.combine(desde, time.min))
+
+    sumas = defaultdict(lambda: [0, 0])
+    tramos = (JornadaEstado.objects.using(db)
+              .filter(fin__isnull=False, fin__gt=desde_dt)
+              .values_list("asesor_id", "estado_id", "inicio", "fin"))
+    for asesor_id, estado_id, inicio, fin in tramos.iterator():
+        cursor, primero = inicio, True
+        while cursor < fin:
+            dia = timezone.localtime(cursor).date()
+            corte = min(fin, timezone.make_aware(datetime.combine(dia + timedelta(days=1), time.min)))
+            if dia >= desde:
+                suma = sumas[(asesor_id, dia, estado_id)]
+                suma[0] += int((corte - cursor).total_seconds())
+                suma[1] += 1 if primero else 0
+            cursor, primero = corte, False
+
+    UsoDiarioEstado.objects.using(db).bulk_create([
+        UsoDiarioEstado(asesor_id=asesor_id, fecha=fecha, estado_id=estado_id,
+                        segundos=segundos, transiciones=transiciones)
+        for (asesor_id, fecha, estado_id), (segundos, transiciones) in sumas.items()
+    ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('workforce', '0011_jornadaestado_workforce_j_asesor__a847bd_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UsoDiarioEstado',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField()),
+                ('segundos', models.PositiveIntegerField(default=0)),
+                ('transiciones', models.PositiveIntegerField(default=0)),
+                ('asesor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='uso_diario', to='workforce.asesor')),
+                ('estado', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='workforce.estadotipo')),
+            ],
+            options={
+                'unique_together': {('asesor', 'fecha', 'estado')},
+            },
+        ),
+        # hints: el router sólo lo deja correr en la BD de workforce
+        migrations.RunPython(rellenar_uso_diario, migrations.RunPython.noop,
+                             hints={"model_name": "usodiarioestado"}),
+    ]
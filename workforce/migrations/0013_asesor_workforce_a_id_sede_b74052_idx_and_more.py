@@ -0,0 +1,21 @@
+# Generated by Django 5.2.7 on 2026-10-18 09:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('workforce', '0012_usodiarioestado'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='asesor',
+            index=models.Index(fields=['id_sede'], name='workforce_a_id_sede_b74052_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='jornadaestado',
+            index=models.Index(fields=['asesor', 'fin'], name='workforce_j_asesor__b434e2_idx'),
+        ),
+    ]
@@ -81,6 +81,12 @@ class Asesor(models.Model):
     cargo = models.CharField(max_length=120, blank=True, default="")
     id_sede = models.IntegerField(null=True, blank=True)
 
+    class Meta:
+        indexes = [
+            # estado del equipo por sede (ver services.estado_equipo)
+            models.Index(fields=["id_sede"]),
+        ]
+
     def __str__(self):
         return f"{self.id_asesor} - {self.nombre or 'Asesor'}"
 
@@ -143,27 +149,61 @@ class JornadaEstado(models.Model):
     limite_minutos = models.IntegerField(null=True, blank=True)
     diferencia_minutos = models.IntegerField(null=True, blank=True)
 
-    def calcular_duracion(self):
-        """Calcula duración y guarda diferencia de minutos vs límite."""
-        if not self.fin:
-            self.fin = timezone.now()
-        duracion = int((self.fin - self.inicio).total_seconds())
-        self.duracion_seg = duracion
+    class Meta:
+        indexes = [
+            # uso diario: asesor + estado acotado por inicio (ver services._tramos_del_rango)
+            models.Index(fields=["asesor", "estado", "inicio"]),
+            # tramo abierto de cada asesor (fin IS NULL)
+            models.Index(fields=["asesor", "fin"]),
+        ]
 
-        # 🔽 Importación LOCAL para evitar ciclo
-        from .services import limite_minutos_resuelto
+    CAMPOS_CIERRE = ['fin', 'duracion_seg', 'limite_minutos', 'diferencia_minutos']
 
-        limite = limite_minutos_resuelto(self.asesor, self.estado)
+    def cerrar(self, fin, limite):
+        """Fija fin, duración y diferencia vs ``limite`` (ya resuelto) sin guardar."""
+        self.fin = fin
+        duracion = int((self.fin - self.inicio).total_seconds())
+        self.duracion_seg = duracion
         self.limite_minutos = limite
         if limite is not None:
             usado_min = duracion // 60
             self.diferencia_minutos = limite - usado_min
 
-        self.save(update_fields=['fin', 'duracion_seg', 'limite_minutos', 'diferencia_minutos'])
+    def calcular_duracion(self, limite=models.NOT_PROVIDED):
+        """
+        Calcula duración y guarda diferencia de minutos vs límite.
+        ``limite`` ya resuelto (services.ConfigAsesor.limit) evita cargar asesor,
+        estado y config: el cierre queda en un solo UPDATE.
+        """
+        # 🔽 Importación LOCAL para evitar ciclo
+        from . import catalogo
+        from .services import acumular_uso_diario, limite_minutos_resuelto
 
+        if limite is models.NOT_PROVIDED:
+            limite = limite_minutos_resuelto(self.asesor, catalogo.estado_por_id(self.estado_id))
+        self.cerrar(self.fin or timezone.now(), limite)
 
+        self.save(update_fields=self.CAMPOS_CIERRE)
+        acumular_uso_diario(self)
 
-    
+
+class UsoDiarioEstado(models.Model):
+    """
+    Acumulado diario (fecha local) de tiempo por asesor y estado, mantenido al
+    cerrar cada tramo (services.acumular_uso_diario). Los tramos abiertos no
+    están aquí: se suman al vuelo. Reconstruir con ``manage.py rebuild_uso_diario``.
+    """
+    asesor = models.ForeignKey('Asesor', on_delete=models.CASCADE, related_name='uso_diario')
+    fecha = models.DateField()
+    estado = models.ForeignKey('EstadoTipo', on_delete=models.CASCADE)
+    segundos = models.PositiveIntegerField(default=0)
+    transiciones = models.PositiveIntegerField(default=0)  # tramos iniciados ese día
+
+    class Meta:
+        unique_together = [('asesor', 'fecha', 'estado')]
+
+    def __str__(self):
+        return f"{self.asesor_id} {self.fecha} {self.estado_id}: {self.segundos}s"
 
 
 
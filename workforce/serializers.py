@@ -5,7 +5,8 @@ from .models import (
 )
 import re
 from typing import Optional, Dict
-from django.apps import apps
+from accounts.perfiles import profile
+from . import catalogo
 from rest_framework import serializers
 from .models import Asesor, EstadoTipo, EstadoConfigAsesor
 from .models import Asesor, EstadoTipo, JornadaEstado, JornadaLaboral
@@ -38,6 +39,17 @@ class AsignacionHorarioSerializer(serializers.ModelSerializer):
 # ----------------------- Estados -----------------------
 HEX_RE = re.compile(r"^#([0-9a-fA-F]{3}|[0-9a-fA-F]{6})$")
 
+
+def validar_color_hex(v):
+    """Valida formato #RRGGBB o #RGB; vacío/None → "" (sin color propio)."""
+    if v in (None, ""):
+        return ""
+    v = v.strip()
+    if not HEX_RE.match(v):
+        raise serializers.ValidationError("Formato inválido. Usa #RRGGBB o #RGB.")
+    return v.lower()
+
+
 class EstadoTipoSerializer(serializers.ModelSerializer):
     """Serializer simple para mostrar los datos del EstadoTipo."""
     class Meta:
@@ -51,67 +63,22 @@ class EstadoTipoSerializer(serializers.ModelSerializer):
 # workforce/serializers.py
 #-------------- CREACION DE CONFIGURACIONES DE HORARIOS ------------------------------
 
-# ----- helpers de resolución (ahora apuntan a 'accounts') -----
-def M_Asesores():
-    return apps.get_model('accounts', 'Asesores')
-
-def M_Pri():
-    return apps.get_model('accounts', 'Pri')
-
-def M_InfTrab():
-    return apps.get_model('accounts', 'InfTrab')
-
-def M_CargosDistritec():
-    return apps.get_model('accounts', 'CargosDistritec')
-
 # Ajusta a tus estados válidos
 ALLOWED_ESTADOS = {1, 2, 3}
 
 def datos_basicos_asesor(id_asesor: int, id_sede_preferida: Optional[int] = None) -> Dict:
     """
-    Arma nombre, cargo (texto) e id_sede desde los modelos de la app 'accounts'.
+    Arma nombre, cargo (texto) e id_sede desde el perfil ERP cacheado
+    (accounts.perfiles): último PRI permitido, opcionalmente en la sede preferida.
     """
-    Asesores = M_Asesores()
-    Pri = M_Pri()
-    InfTrab = M_InfTrab()
-    CargosDistritec = M_CargosDistritec()
-
-    nombre, cargo_txt, id_sede = "", "", None
-
-    # 1) Nombre desde maestro (accounts.Asesores)
-    fila_erp = (Asesores.objects
-                .filter(ID_Asesor=id_asesor)
-                .values("Nombre")
-                .first())
-    if fila_erp:
-        nombre = (fila_erp.get("Nombre") or "").strip()
-
-    # 2) Último PRI permitido (opcionalmente dentro de la sede preferida)
-    pri_qs = Pri.objects.filter(ID_Asesor=id_asesor, ID_Estado__in=ALLOWED_ESTADOS)
-    if id_sede_preferida:
-        pri_qs = pri_qs.filter(ID_Sede=id_sede_preferida)
-
-    pri = (pri_qs.order_by("-ID_Pri")
-           .values("ID_Sede", "ID_Inf_trab")
-           .first())
-
-    if pri:
-        id_sede = pri["ID_Sede"]
-        inf_id = pri["ID_Inf_trab"]
-        if inf_id:
-            inf = (InfTrab.objects
-                   .filter(ID_Inf_trab=inf_id)
-                   .values("Cargo")
-                   .first())
-            if inf and inf.get("Cargo"):
-                cargo_row = (CargosDistritec.objects
-                             .filter(id_cargo=inf["Cargo"])
-                             .values("cargo")
-                             .first())
-                if cargo_row:
-                    cargo_txt = cargo_row.get("cargo") or ""
-
-    return {"nombre": nombre, "cargo": cargo_txt, "id_sede": id_sede}
+    perfil = profile(id_asesor, id_sede=id_sede_preferida, estados=ALLOWED_ESTADOS)
+    if perfil is None:
+        return {"nombre": "", "cargo": "", "id_sede": None}
+    return {
+        "nombre": (perfil["nombre"] or "").strip(),
+        "cargo": perfil["cargo"] or "",
+        "id_sede": perfil["id_sede"],
+    }
 
 
 class EstadoConfigAsesorSerializer(serializers.ModelSerializer):
@@ -154,12 +121,7 @@ class EstadoConfigAsesorSerializer(serializers.ModelSerializer):
     # ---------------------------------------------------------------------
     def validate_color_hex_override(self, v):
         """Valida formato #RRGGBB o #RGB."""
-        if v in (None, ""):
-            return ""
-        v = v.strip()
-        if not HEX_RE.match(v):
-            raise serializers.ValidationError("Formato inválido. Usa #RRGGBB o #RGB.")
-        return v.lower()
+        return validar_color_hex(v)
 
     # ---------------------------------------------------------------------
     # ✅ Campo dinámico (no se guarda en la DB)
@@ -207,6 +169,37 @@ class EstadoConfigAsesorSerializer(serializers.ModelSerializer):
         )
 
         return EstadoConfigAsesor.objects.create(asesor=asesor_obj, **validated_data)
+
+
+class EstadoConfigBulkSerializer(serializers.Serializer):
+    """
+    Entrada de la alta masiva (asesores × estados). Sin ``asesores`` se toman
+    los asesores activos en ``id_sede`` según el ERP.
+    """
+    asesores = serializers.ListField(child=serializers.IntegerField(), required=False, allow_empty=False)
+    id_sede = serializers.IntegerField(required=False)
+    estados = serializers.ListField(child=serializers.IntegerField(), allow_empty=False)
+    activo = serializers.BooleanField(default=True)
+    color_hex_override = serializers.CharField(required=False, allow_blank=True, allow_null=True)
+
+    def validate_color_hex_override(self, v):
+        # null (o ausente) conserva los colores existentes; "" los quita
+        if v is None:
+            return None
+        return validar_color_hex(v)
+
+    def validate_estados(self, ids):
+        # del catálogo en memoria: sin una consulta por id
+        estados = [catalogo.estado_por_id(i) for i in dict.fromkeys(ids)]
+        faltan = [i for i, e in zip(dict.fromkeys(ids), estados) if e is None]
+        if faltan:
+            raise serializers.ValidationError(f"Estados inexistentes: {faltan}")
+        return estados
+
+    def validate(self, data):
+        if not data.get("asesores") and not data.get("id_sede"):
+            raise serializers.ValidationError("Envía 'asesores' o 'id_sede'.")
+        return data
 #----------------------------------------------------------------------------------------------
 
 
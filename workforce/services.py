@@ -1,8 +1,19 @@
 # workforce/services.py
-from django.db import transaction
+from collections import defaultdict
+from django.core.cache import cache
+from django.db import IntegrityError, connections, router, transaction
+from django.db.models import (
+    Count, DateTimeField, DurationField, ExpressionWrapper, F, OuterRef, Q, Subquery, Sum, Value
+)
+from django.db.models.functions import Coalesce, Greatest, Least
 from django.utils import timezone
-from datetime import date
-from .models import Asesor, EstadoTipo, EstadoConfigAsesor, JornadaEstado
+from datetime import date, datetime, time, timedelta
+from core.caches import ttl
+from core.dbrouters import marcar_escritura
+from .models import Asesor, EstadoConfigAsesor, JornadaEstado, UsoDiarioEstado
+from accounts import perfiles
+from .serializers import ALLOWED_ESTADOS, datos_basicos_asesor
+from . import catalogo
 
 def _hoy_range(tz=None):
     now = timezone.localtime() if tz is None else timezone.now().astimezone(tz)
@@ -10,20 +21,394 @@ def _hoy_range(tz=None):
     end = start + timezone.timedelta(days=1)
     return start, end
 
-def tiempo_usado_hoy_min(asesor, estado):
-    start, end = _hoy_range()
-    qs = JornadaEstado.objects.filter(
-        asesor=asesor, estado=estado, inicio__lt=end
-    ).filter(
-        # tramo que cae en el día
+def _tramos_del_rango(asesor, start, end):
+    """
+    Tramos de JornadaEstado que se cruzan con [start, end), acotados por ambos
+    lados (inicio < end y fin > start o abierto) para usar el índice
+    (asesor, estado, inicio) y no recorrer todo el histórico del asesor.
+    ``asesor=None`` abarca a todos (reconstrucción del acumulado diario).
+    """
+    qs = JornadaEstado.objects.filter(inicio__lt=end).filter(Q(fin__gt=start) | Q(fin__isnull=True))
+    if asesor is not None:
+        qs = qs.filter(asesor=asesor)
+    return qs
+
+
+def _duracion_recortada(start, end, now):
+    """Expresión SQL: duración del tramo recortada a [start, end) (abiertos hasta now)."""
+    return ExpressionWrapper(
+        Least(Coalesce(F("fin"), Value(now, output_field=DateTimeField())),
+              Value(end, output_field=DateTimeField()))
+        - Greatest(F("inicio"), Value(start, output_field=DateTimeField())),
+        output_field=DurationField(),
     )
-    total = 0
-    for j in qs:
-        i = max(j.inicio, start)
-        f = min(j.fin or timezone.now(), end)
+
+
+def segundos_hoy(asesor, estado=None):
+    """
+    Segundos usados hoy por estado: acumulado diario (tramos cerrados) más los
+    tramos abiertos recortados a hoy. Dos consultas indexadas: {estado_id: seg}.
+    """
+    start, end = _hoy_range()
+    uso = UsoDiarioEstado.objects.filter(asesor=asesor, fecha=start.date())
+    abiertos = JornadaEstado.objects.filter(asesor=asesor, fin__isnull=True, inicio__lt=end)
+    if estado is not None:
+        uso = uso.filter(estado=estado)
+        abiertos = abiertos.filter(estado=estado)
+
+    segundos = defaultdict(int, uso.values_list("estado_id", "segundos"))
+    now = timezone.now()
+    for estado_id, inicio in abiertos.values_list("estado_id", "inicio"):
+        i = max(inicio, start)
+        f = min(now, end)
         if f > i:
-            total += int((f - i).total_seconds() // 60)
-    return total
+            segundos[estado_id] += int((f - i).total_seconds())
+    return segundos
+
+
+def tiempo_usado_hoy_min(asesor, estado):
+    return segundos_hoy(asesor, estado=estado).get(estado.id, 0) // 60
+
+
+# ---------------------- Acumulado diario (UsoDiarioEstado) ----------------------
+
+def _partir_por_dia(inicio, fin):
+    """Parte [inicio, fin) por días locales: genera (fecha, segundos)."""
+    cursor = inicio
+    while cursor < fin:
+        dia = timezone.localtime(cursor).date()
+        siguiente = timezone.make_aware(datetime.combine(dia + timedelta(days=1), time.min))
+        corte = min(fin, siguiente)
+        yield dia, int((corte - cursor).total_seconds())
+        cursor = corte
+
+
+def _sumar_uso(asesor_id, fecha, estado_id, segundos, transiciones):
+    filtro = {"asesor_id": asesor_id, "fecha": fecha, "estado_id": estado_id}
+    cambios = {
+        "segundos": F("segundos") + segundos,
+        "transiciones": F("transiciones") + transiciones,
+    }
+    if UsoDiarioEstado.objects.filter(**filtro).update(**cambios):
+        return
+    try:
+        with transaction.atomic(using=router.db_for_write(UsoDiarioEstado)):
+            UsoDiarioEstado.objects.create(**filtro, segundos=segundos, transiciones=transiciones)
+    except IntegrityError:
+        # otro proceso creó la fila entre el update y el create
+        UsoDiarioEstado.objects.filter(**filtro).update(**cambios)
+
+
+def acumular_uso_diario_en_bloque(jornadas, db):
+    """
+    Como acumular_uso_diario para muchos tramos: agrupa por (asesor, fecha, estado),
+    lee las filas existentes en una consulta y escribe con bulk_update/bulk_create.
+    Llamar con las filas de los asesores bloqueadas (ver transicionar_estados).
+    """
+    sumas = defaultdict(lambda: [0, 0])
+    for jornada in jornadas:
+        if not jornada.fin:
+            continue
+        primero = True
+        for fecha, segundos in _partir_por_dia(jornada.inicio, jornada.fin):
+            suma = sumas[(jornada.asesor_id, fecha, jornada.estado_id)]
+            suma[0] += segundos
+            suma[1] += 1 if primero else 0
+            primero = False
+    if not sumas:
+        return
+
+    filtro = Q()
+    for asesor_id, fecha, estado_id in sumas:
+        filtro |= Q(asesor_id=asesor_id, fecha=fecha, estado_id=estado_id)
+    existentes = list(UsoDiarioEstado.objects.using(db).filter(filtro))
+    for fila in existentes:
+        segundos, transiciones = sumas.pop((fila.asesor_id, fila.fecha, fila.estado_id))
+        fila.segundos += segundos
+        fila.transiciones += transiciones
+    UsoDiarioEstado.objects.using(db).bulk_update(existentes, ["segundos", "transiciones"], batch_size=500)
+    UsoDiarioEstado.objects.using(db).bulk_create([
+        UsoDiarioEstado(asesor_id=asesor_id, fecha=fecha, estado_id=estado_id,
+                        segundos=segundos, transiciones=transiciones)
+        for (asesor_id, fecha, estado_id), (segundos, transiciones) in sumas.items()
+    ], batch_size=500)
+
+
+def acumular_uso_diario(jornada):
+    """Suma un tramo recién cerrado al acumulado diario (partido por día local)."""
+    if not jornada.fin:
+        return
+    primero = True
+    for fecha, segundos in _partir_por_dia(jornada.inicio, jornada.fin):
+        _sumar_uso(jornada.asesor_id, fecha, jornada.estado_id, segundos, 1 if primero else 0)
+        primero = False
+
+
+def reconstruir_uso_diario(desde, hasta, asesor=None):
+    """
+    Recalcula UsoDiarioEstado para las fechas [desde, hasta] a partir de los
+    tramos cerrados: por cada día, una consulta que recorta y suma por
+    asesor/estado y otra que cuenta los tramos iniciados. Devuelve filas creadas.
+
+    Cada día va en su propia transacción del primario con las filas de sus
+    asesores bloqueadas (como transicionar_estado y cerrar_tramos_abiertos, que
+    son los que suman al acumulado): un tramo no puede cerrarse entre el borrado
+    y la inserción, así que no hay filas duplicadas ni tramos contados dos veces
+    aunque se reconstruya el día en curso.
+    """
+    db = router.db_for_write(UsoDiarioEstado)
+    creadas = 0
+    dia = desde
+    while dia <= hasta:
+        start = timezone.make_aware(datetime.combine(dia, time.min))
+        end = timezone.make_aware(datetime.combine(dia + timedelta(days=1), time.min))
+        with transaction.atomic(using=db):
+            creadas += _reconstruir_dia(dia, start, end, asesor, db)
+        dia += timedelta(days=1)
+    return creadas
+
+
+def _reconstruir_dia(dia, start, end, asesor, db):
+    tramos = _tramos_del_rango(asesor, start, end).using(db)
+    uso = UsoDiarioEstado.objects.using(db).filter(fecha=dia)
+    if asesor is not None:
+        ids = {asesor.pk}
+    else:
+        # asesores con actividad ese día o con acumulado que limpiar
+        ids = set(tramos.values_list("asesor_id", flat=True)) | set(uso.values_list("asesor_id", flat=True))
+    if not ids:
+        return 0
+    # mismo orden de bloqueo que transicionar_estado: asesor primero, por pk
+    list(Asesor.objects.using(db).select_for_update()
+         .filter(pk__in=ids).order_by("pk").values_list("pk"))
+
+    uso.filter(asesor_id__in=ids).delete()
+    cerrados = tramos.filter(asesor_id__in=ids, fin__isnull=False)
+
+    filas = {}
+    for asesor_id, estado_id, total in (cerrados.values("asesor_id", "estado_id")
+                                        .annotate(total=Sum(_duracion_recortada(start, end, end)))
+                                        .values_list("asesor_id", "estado_id", "total")):
+        seg = max(0, int(total.total_seconds())) if total else 0
+        filas[(asesor_id, estado_id)] = UsoDiarioEstado(
+            asesor_id=asesor_id, fecha=dia, estado_id=estado_id, segundos=seg,
+        )
+    for asesor_id, estado_id, n in (cerrados.filter(inicio__gte=start)
+                                    .values("asesor_id", "estado_id")
+                                    .annotate(n=Count("id"))
+                                    .values_list("asesor_id", "estado_id", "n")):
+        fila = filas.get((asesor_id, estado_id))
+        if fila:
+            fila.transiciones = n
+
+    UsoDiarioEstado.objects.using(db).bulk_create(filas.values(), batch_size=500)
+    return len(filas)
+
+
+def _limite_de(estado, cfg=None):
+    """Regla de límite dada la config (activa) del asesor, ya cargada."""
+    if cfg is not None and cfg.activo:
+        # 🔹 Ya no existe cfg.limite_minutos
+        return estado.limite_minutos_default
+    return estado.limite_minutos_default
+
+
+def _color_de(estado, cfg=None):
+    """Regla de color dada la config del asesor (activa o no), ya cargada."""
+    if cfg is not None:
+        return cfg.color_hex_override or estado.color_hex
+    return estado.color_hex
+
+
+ASESOR_KEY = "workforce:asesor:{}"   # + id_asesor (ERP)
+ASESOR_TTL = 3600
+_CAMPOS_ASESOR = ("id", "id_asesor", "nombre", "cargo", "id_sede")
+
+
+def asesor_por_id(id_asesor):
+    """
+    Asesor por id_asesor sin escribir nada: sus campos se guardan en la caché
+    compartida (``ASESOR_TTL``, invalidada al guardar/borrar Asesor, ver
+    catalogo.py; menos si la caché es por proceso, ver core/caches.py) y si faltan se leen con un SELECT en la BD de lectura.
+    Devuelve None si el asesor no está registrado (ver provisionar_asesor).
+    """
+    key = ASESOR_KEY.format(id_asesor)
+    campos = cache.get(key)
+    if campos is None:
+        # del primario: una réplica atrasada dejaría datos viejos en la caché
+        campos = (Asesor.objects.using(router.db_for_write(Asesor))
+                  .filter(id_asesor=id_asesor).values(*_CAMPOS_ASESOR).first())
+        if campos is None:
+            return None
+        cache.set(key, campos, ttl(ASESOR_TTL))
+    return Asesor.from_db(router.db_for_read(Asesor), list(campos), list(campos.values()))
+
+
+def provisionar_asesor(id_asesor, id_sede_preferida=None):
+    """
+    Registra el asesor (nombre, cargo y sede desde el ERP) si aún no existe.
+    Idempotente: si ya existe lo devuelve sin tocarlo. Devuelve ``(asesor, created)``.
+    """
+    asesor = asesor_por_id(id_asesor)
+    if asesor is not None:
+        return asesor, False
+    datos = datos_basicos_asesor(id_asesor, id_sede_preferida=id_sede_preferida)
+    if id_sede_preferida:
+        datos["id_sede"] = id_sede_preferida
+    asesor, created = Asesor.objects.get_or_create(
+        id_asesor=id_asesor,
+        defaults={
+            "nombre": datos.get("nombre", ""),
+            "cargo": datos.get("cargo", ""),
+            "id_sede": datos.get("id_sede"),
+        },
+    )
+    marcar_escritura(f"asesor:{id_asesor}")
+    return asesor, created
+
+
+def invalidar_asesor(id_asesor):
+    cache.delete(ASESOR_KEY.format(id_asesor))
+
+
+CONFIG_KEY = "workforce:config_asesor:{}"   # + Asesor.pk
+CONFIG_TTL = 300
+
+
+class _Cfg:
+    __slots__ = ("activo", "color_hex_override")
+
+    def __init__(self, activo, color_hex_override):
+        self.activo = activo
+        self.color_hex_override = color_hex_override
+
+
+class ConfigAsesor:
+    """
+    Todas las EstadoConfigAsesor de un asesor, cargadas una vez, con
+    ``limit(estado)`` y ``color(estado)`` en O(1).
+    """
+
+    def __init__(self, filas):
+        # filas: {estado_id: (activo, color_hex_override)}
+        self._cfgs = {estado_id: _Cfg(*v) for estado_id, v in filas.items()}
+
+    def get(self, estado):
+        return self._cfgs.get(estado.id)
+
+    def limit(self, estado):
+        return _limite_de(estado, self.get(estado))
+
+    def color(self, estado):
+        return _color_de(estado, self.get(estado))
+
+
+def config_asesor(asesor):
+    """
+    ConfigAsesor del asesor (instancia o pk). Se guarda en la caché compartida
+    (``CONFIG_TTL``, acotado si es por proceso) y se invalida al escribir
+    EstadoConfigAsesor (ver catalogo.py).
+    """
+    asesor_pk = getattr(asesor, "pk", asesor)
+    key = CONFIG_KEY.format(asesor_pk)
+    filas = cache.get(key)
+    if filas is None:
+        filas = {
+            estado_id: (activo, color)
+            for estado_id, activo, color in EstadoConfigAsesor.objects
+            .using(router.db_for_write(EstadoConfigAsesor))
+            .filter(asesor_id=asesor_pk)
+            .values_list("estado_id", "activo", "color_hex_override")
+        }
+        cache.set(key, filas, ttl(CONFIG_TTL))
+    return ConfigAsesor(filas)
+
+
+def configs_asesores(asesor_pks):
+    """``{pk: ConfigAsesor}`` de varios asesores: un get_many y una consulta para los que falten."""
+    keys = {CONFIG_KEY.format(pk): pk for pk in set(asesor_pks)}
+    en_cache = cache.get_many(list(keys))
+    filas = {keys[k]: v for k, v in en_cache.items()}
+    faltan = [pk for k, pk in keys.items() if k not in en_cache]
+    if faltan:
+        nuevas = {pk: {} for pk in faltan}
+        for asesor_id, estado_id, activo, color in (EstadoConfigAsesor.objects
+                                                    .using(router.db_for_write(EstadoConfigAsesor))
+                                                    .filter(asesor_id__in=faltan)
+                                                    .values_list("asesor_id", "estado_id", "activo", "color_hex_override")):
+            nuevas[asesor_id][estado_id] = (activo, color)
+        cache.set_many({CONFIG_KEY.format(pk): v for pk, v in nuevas.items()}, ttl(CONFIG_TTL))
+        filas.update(nuevas)
+    return {pk: ConfigAsesor(v) for pk, v in filas.items()}
+
+
+def invalidar_config_asesor(asesor_pk):
+    cache.delete(CONFIG_KEY.format(asesor_pk))
+
+
+def _upsert_kwargs(model, unique_fields, update_fields):
+    """kwargs de bulk_create(update_conflicts=True); MySQL no admite unique_fields."""
+    kwargs = {"update_conflicts": True, "update_fields": update_fields}
+    if connections[router.db_for_write(model)].features.supports_update_conflicts_with_target:
+        kwargs["unique_fields"] = unique_fields
+    return kwargs
+
+
+def provisionar_configs(ids_asesor, estados, id_sede=None, activo=True, color_hex_override=None):
+    """
+    Alta masiva de EstadoConfigAsesor para la matriz ``ids_asesor`` × ``estados``
+    (p.e. toda una sede al incorporarla). Los asesores se enriquecen con el ERP
+    en un lote (accounts.perfiles) y se registran/actualizan con un upsert;
+    las configs se escriben con otro, sin consultas por fila.
+
+    Con ``ids_asesor=None`` toma los asesores del ERP activos en ``id_sede``.
+    ``color_hex_override=None`` conserva el color de las configs existentes.
+    Devuelve ``{"asesores", "configs", "sin_erp"}``.
+    """
+    if ids_asesor is None:
+        candidatos = perfiles.profiles(perfiles.ids_de_sede(id_sede), id_sede=id_sede, estados=ALLOWED_ESTADOS)
+        ids_asesor = sorted(i for i, p in candidatos.items() if p["estado"] is not None)
+    ids_asesor = list(dict.fromkeys(int(i) for i in ids_asesor))
+    if not ids_asesor or not estados:
+        return {"asesores": 0, "configs": 0, "sin_erp": []}
+
+    # Mismo criterio que datos_basicos_asesor: último PRI permitido (en la sede preferida)
+    erp = perfiles.profiles(ids_asesor, id_sede=id_sede, estados=ALLOWED_ESTADOS)
+    db = router.db_for_write(EstadoConfigAsesor)
+    with transaction.atomic(using=db):
+        Asesor.objects.using(db).bulk_create(
+            [
+                Asesor(
+                    id_asesor=i,
+                    nombre=(erp[i]["nombre"] or "").strip() if i in erp else "",
+                    cargo=(erp[i]["cargo"] or "") if i in erp else "",
+                    id_sede=id_sede or (erp[i]["id_sede"] if i in erp else None),
+                )
+                for i in ids_asesor
+            ],
+            batch_size=500,
+            **_upsert_kwargs(Asesor, ["id_asesor"], ["nombre", "cargo", "id_sede"]),
+        )
+        pks = dict(Asesor.objects.using(db).filter(id_asesor__in=ids_asesor).values_list("id_asesor", "pk"))
+
+        campos = ["activo"] if color_hex_override is None else ["activo", "color_hex_override"]
+        configs = [
+            EstadoConfigAsesor(asesor_id=pks[i], estado_id=e.id, activo=activo,
+                               color_hex_override=color_hex_override)
+            for i in ids_asesor
+            for e in estados
+        ]
+        EstadoConfigAsesor.objects.using(db).bulk_create(
+            configs, batch_size=500,
+            **_upsert_kwargs(EstadoConfigAsesor, ["asesor", "estado"], campos),
+        )
+
+    # bulk_create no dispara post_save: invalidar a mano lo que cachean las señales
+    cache.delete_many([ASESOR_KEY.format(i) for i in ids_asesor]
+                      + [CONFIG_KEY.format(pk) for pk in pks.values()])
+    return {"asesores": len(ids_asesor), "configs": len(configs),
+            "sin_erp": [i for i in ids_asesor if i not in erp]}
+
 
 def limite_minutos_resuelto(asesor, estado):
     """
@@ -31,46 +416,219 @@ def limite_minutos_resuelto(asesor, estado):
     - Si hay configuración de asesor → usa el límite del EstadoTipo asociado
     - Si no, usa el límite por defecto del EstadoTipo
     """
-    cfg = EstadoConfigAsesor.objects.filter(asesor=asesor, estado=estado, activo=True).select_related("estado").first()
-    if cfg:
-        # 🔹 Ya no existe cfg.limite_minutos
-        return cfg.estado.limite_minutos_default
-    return estado.limite_minutos_default
+    return config_asesor(asesor).limit(estado)
 
 
 def color_resuelto(asesor, estado):
-    try:
-        cfg = EstadoConfigAsesor.objects.get(asesor=asesor, estado=estado)
-        return cfg.color_hex_override or estado.color_hex
-    except EstadoConfigAsesor.DoesNotExist:
-        return estado.color_hex
+    return config_asesor(asesor).color(estado)
+
+
+def uso_estados_hoy(asesor, estados):
+    """
+    Límite, minutos usados hoy y color de todos los ``estados`` del asesor con
+    un número fijo de consultas (configs + acumulado diario + tramo abierto),
+    en vez de 3 por estado.
+    Devuelve ``{estado_id: {"limite", "usado", "color"}}``.
+    ``asesor=None`` (aún no registrado): valores del catálogo y nada usado.
+    """
+    if asesor is None:
+        cfg, segundos = ConfigAsesor({}), {}
+    else:
+        cfg = config_asesor(asesor)
+        segundos = segundos_hoy(asesor)
+
+    return {
+        e.id: {
+            "limite": cfg.limit(e),
+            "usado": segundos.get(e.id, 0) // 60,
+            "color": cfg.color(e),
+        }
+        for e in estados
+    }
+
+
+def estado_equipo(id_sede=None, ids_asesor=None):
+    """
+    Tramos abiertos de un equipo (por ``id_sede`` y/o lista de id_asesor) en una
+    sola consulta: JornadaEstado + Asesor, con el color override de la config
+    como subconsulta correlacionada. El EstadoTipo sale del catálogo en memoria.
+    """
+    qs = JornadaEstado.objects.filter(fin__isnull=True).select_related("asesor")
+    if id_sede is not None:
+        qs = qs.filter(asesor__id_sede=id_sede)
+    if ids_asesor is not None:
+        qs = qs.filter(asesor__id_asesor__in=ids_asesor)
+    qs = qs.annotate(color_override=Subquery(
+        EstadoConfigAsesor.objects
+        .filter(asesor_id=OuterRef("asesor_id"), estado_id=OuterRef("estado_id"))
+        .values("color_hex_override")[:1]
+    )).order_by("asesor__nombre", "asesor__id_asesor")
+
+    now = timezone.now()
+    equipo = []
+    for j in qs:
+        estado = catalogo.estado_por_id(j.estado_id)
+        equipo.append({
+            "asesor": j.asesor.id_asesor,
+            "nombre": j.asesor.nombre,
+            "cargo": j.asesor.cargo,
+            "id_sede": j.asesor.id_sede,
+            "estado": estado.slug,
+            "estado_nombre": estado.nombre,
+            "color": j.color_override or estado.color_hex,
+            "inicio": j.inicio,
+            "segundos": max(0, int((now - j.inicio).total_seconds())),
+        })
+    return equipo
+
+
+def _plan_cierre(abiertos, estado, ahora):
+    """
+    Dados los tramos abiertos de un asesor (más reciente primero), decide cuáles
+    cerrar para pasar a ``estado``: devuelve ``(mismo, [(tramo, fin), ...])``.
+    ``mismo`` indica que el vigente ya está en ``estado`` y se conserva; cada
+    tramo sobrante (datos previos) termina donde empieza el siguiente.
+    """
+    mismo = bool(abiertos) and abiertos[0].estado_id == estado.id
+    cierres = [
+        (abierto, abiertos[i - 1].inicio if i else ahora)
+        for i, abierto in enumerate(abiertos)
+        if i or not mismo
+    ]
+    return mismo, cierres
+
+
+def _cerrar_tramos(cierres, db):
+    """
+    Cierra ``[(tramo, fin), ...]`` con un bulk_update y los suma al acumulado
+    diario. Requiere las filas de sus asesores bloqueadas.
+    """
+    if not cierres:
+        return
+    cfgs = configs_asesores(tramo.asesor_id for tramo, _ in cierres)
+    for tramo, fin in cierres:
+        tramo.cerrar(fin, cfgs[tramo.asesor_id].limit(catalogo.estado_por_id(tramo.estado_id)))
+    tramos = [tramo for tramo, _ in cierres]
+    JornadaEstado.objects.using(db).bulk_update(tramos, JornadaEstado.CAMPOS_CIERRE, batch_size=500)
+    acumular_uso_diario_en_bloque(tramos, db)
 
 
-@transaction.atomic
 def transicionar_estado(asesor: Asesor, estado_slug: str, meta=None):
+    """
+    Cierra el tramo abierto del asesor y abre uno nuevo en ``estado_slug``.
+
+    Todo ocurre en una transacción de database_HRS con la fila del asesor
+    bloqueada (SELECT ... FOR UPDATE): dos transiciones simultáneas del mismo
+    asesor (doble clic, WS + HTTP) se serializan y la segunda ve el tramo que
+    abrió la primera, así que nunca quedan dos tramos abiertos. Si ya los hubiera
+    (datos previos), se cierran todos menos el vigente.
+    """
     slug = (estado_slug or "").strip().lower()
-    try:
-        estado = EstadoTipo.objects.get(slug=slug, activo=True)
-    except EstadoTipo.DoesNotExist:
+    estado = catalogo.estado_por_slug(slug)
+    if estado is None:
         raise ValueError(f"Estado '{slug}' no existe o está inactivo")
 
-    # Cerrar estado abierto anterior
-    abierto = JornadaEstado.objects.filter(asesor=asesor, fin__isnull=True).first()
-    if abierto and abierto.estado == estado:
-        # Ya está en el mismo estado
-        return abierto, False
-
-    if abierto:
-        abierto.fin = timezone.now()
-        abierto.calcular_duracion()  # <-- NUEVO cálculo automático
-
-    # Crear nuevo estado
-    nuevo = JornadaEstado.objects.create(
-        asesor=asesor,
-        estado=estado,
-        inicio=timezone.now(),
-        meta=meta or {}
-    )
-    return nuevo, True
+    db = router.db_for_write(JornadaEstado)
+    with transaction.atomic(using=db):
+        Asesor.objects.using(db).select_for_update().filter(pk=asesor.pk).values_list("pk").first()
+
+        abiertos = list(JornadaEstado.objects.using(db)
+                        .filter(asesor=asesor, fin__isnull=True)
+                        .order_by("-inicio", "-id"))
+        cfg = config_asesor(asesor)
+        ahora = timezone.now()
+        mismo, cierres = _plan_cierre(abiertos, estado, ahora)
+        for abierto, fin in cierres:
+            abierto.fin = fin
+            abierto.calcular_duracion(limite=cfg.limit(catalogo.estado_por_id(abierto.estado_id)))
+        if mismo:
+            # Ya está en el mismo estado
+            return abiertos[0], False
 
+        # Crear nuevo estado
+        nuevo = JornadaEstado.objects.using(db).create(
+            asesor=asesor,
+            estado=estado,
+            inicio=ahora,
+            meta=meta or {}
+        )
+    marcar_escritura(f"asesor:{asesor.id_asesor}")
     return nuevo, True
+
+
+def transicionar_estados(ids_asesor, estado_slug: str, meta=None):
+    """
+    Transición masiva (p. ej. todo un equipo a ``reunion``): bloquea las filas de
+    los asesores, cierra sus tramos abiertos con un bulk_update y abre los nuevos
+    con un bulk_create, todo en una transacción.
+
+    ``ids_asesor`` son id_asesor (ERP). Devuelve un resultado por id, en orden:
+    ``{"asesor", "ok", "created", "detail"}``.
+    """
+    slug = (estado_slug or "").strip().lower()
+    estado = catalogo.estado_por_slug(slug)
+    if estado is None:
+        raise ValueError(f"Estado '{slug}' no existe o está inactivo")
+
+    ids_asesor = list(dict.fromkeys(ids_asesor))
+    db = router.db_for_write(JornadaEstado)
+    resultados = []
+    with transaction.atomic(using=db):
+        asesores = {
+            a.id_asesor: a
+            for a in Asesor.objects.using(db).select_for_update()
+            .filter(id_asesor__in=ids_asesor).order_by("pk")
+        }
+        abiertos = defaultdict(list)
+        for j in (JornadaEstado.objects.using(db)
+                  .filter(asesor__in=list(asesores.values()), fin__isnull=True)
+                  .order_by("-inicio", "-id")):
+            abiertos[j.asesor_id].append(j)
+
+        ahora = timezone.now()
+        cierres, nuevos = [], []
+        for id_asesor in ids_asesor:
+            asesor = asesores.get(id_asesor)
+            if asesor is None:
+                resultados.append({"asesor": id_asesor, "ok": False, "created": False,
+                                   "detail": "Asesor no registrado"})
+                continue
+            mismo, cierres_asesor = _plan_cierre(abiertos.get(asesor.pk, []), estado, ahora)
+            cierres.extend(cierres_asesor)
+            if not mismo:
+                nuevos.append(JornadaEstado(asesor=asesor, estado=estado, inicio=ahora, meta=meta or {}))
+            resultados.append({"asesor": id_asesor, "ok": True, "created": not mismo, "detail": None})
+
+        _cerrar_tramos(cierres, db)
+        JornadaEstado.objects.using(db).bulk_create(nuevos, batch_size=500)
+    for id_asesor in asesores:
+        marcar_escritura(f"asesor:{id_asesor}")
+    return resultados
+
+
+def cerrar_tramos_abiertos(antes_de, batch_size=500):
+    """
+    Cierra en lotes los tramos abiertos que empezaron antes de ``antes_de``
+    (tramos colgados de turnos anteriores o barrido de fin de turno). Cada tramo
+    termina al final de su día local o ahora, lo que ocurra antes.
+    Devuelve cuántos tramos se cerraron.
+    """
+    db = router.db_for_write(JornadaEstado)
+    pendientes = JornadaEstado.objects.using(db).filter(fin__isnull=True, inicio__lt=antes_de)
+    total = 0
+    while True:
+        lote = list(pendientes.order_by("id").values_list("id", "asesor_id")[:batch_size])
+        if not lote:
+            return total
+        with transaction.atomic(using=db):
+            # mismo orden de bloqueo que transicionar_estado: asesor primero
+            list(Asesor.objects.using(db).select_for_update()
+                 .filter(pk__in={asesor_id for _, asesor_id in lote}).order_by("pk").values_list("pk"))
+            tramos = list(pendientes.filter(id__in=[pk for pk, _ in lote]))
+            ahora = timezone.now()
+            _cerrar_tramos([
+                (t, min(ahora, timezone.make_aware(datetime.combine(
+                    timezone.localtime(t.inicio).date() + timedelta(days=1), time.min))))
+                for t in tramos
+            ], db)
+        total += len(tramos)
@@ -0,0 +1,245 @@
+# workforce/status_store.py
+"""
+Almacén de estados en vivo de los agentes conectados por WebSocket.
+
+Cada agente tiene su propia entrada en caché (``workforce:status:<userId>``) y un
+índice de membresía (``workforce:statuses:index``) guarda qué userIds están
+conectados. Un ping o un cambio de estado sólo lee/escribe la entrada de ese
+agente; el panel del líder obtiene el roster completo con un único ``get_many``.
+
+La última señal de vida (``workforce:seen:<userId>``) va en una clave aparte:
+los heartbeats se escriben en bloque sin leer ni bloquear la entrada de estado.
+
+Todo vive en el alias de caché ``realtime`` (ver CACHES en settings), dimensionado
+para que no descarte entradas: perder el índice o la entrada de un agente lo
+sacaría del roster del líder. Las claves se guardan sin expiración.
+
+Las funciones son síncronas (candados con espera, idas y vueltas a Redis); el
+consumer y la tarea de heartbeats usan las versiones ``a*`` del final, que las
+ejecutan en un hilo para no bloquear el event loop.
+"""
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+from asgiref.sync import sync_to_async
+from django.core.cache import caches
+from django.core.cache.backends.redis import RedisCache
+from django.utils.connection import ConnectionProxy
+
+REALTIME_CACHE = "realtime"
+cache = ConnectionProxy(caches, REALTIME_CACHE)
+
+STATUS_PREFIX = "workforce:status:"       # + userId -> dict del agente
+SEEN_PREFIX = "workforce:seen:"           # + userId -> {"iso": str, "ts": epoch}
+INDEX_KEY = "workforce:statuses:index"    # SET de userIds (str) conectados
+LOCK_SUFFIX = ":lock"
+
+LOCK_TIMEOUT = 5        # segundos que vive un candado huérfano
+LOCK_WAIT = 0.005       # espera entre reintentos
+LOCK_RETRIES = 200      # ~1s como máximo esperando un candado
+
+
+def _key(user_id):
+    return f"{STATUS_PREFIX}{user_id}"
+
+
+def _seen_key(user_id):
+    return f"{SEEN_PREFIX}{user_id}"
+
+
+def _seen(iso=None, ts=None):
+    ts = time.time() if ts is None else ts
+    return {"iso": iso, "ts": ts}
+
+
+class StatusOcupado(Exception):
+    """No se consiguió el candado de la entrada a tiempo: no se escribió nada."""
+
+
+@contextmanager
+def _locked(key):
+    """
+    Candado corto basado en ``cache.add`` (atómico en locmem, redis y memcached).
+    Si no se consigue en ~1s lanza ``StatusOcupado``: nunca se escribe sin él
+    (el llamador puede reintentar; el Marcador reenvía su estado cada 30s).
+    """
+    lock_key = key + LOCK_SUFFIX
+    token = uuid.uuid4().hex
+    for _ in range(LOCK_RETRIES):
+        if cache.add(lock_key, token, LOCK_TIMEOUT):
+            break
+        time.sleep(LOCK_WAIT)
+    else:
+        raise StatusOcupado(key)
+    try:
+        yield
+    finally:
+        if cache.get(lock_key) == token:
+            cache.delete(lock_key)
+
+
+# Índice de conectados. En Redis es un SET nativo (SADD/SREM atómicos, sin
+# leer-modificar-escribir entre procesos); en memoria local la caché es de este
+# proceso y basta un candado de hilo.
+_index_lock = threading.Lock()
+
+
+def _redis_index():
+    """(cliente, clave) del SET en Redis, o (None, None) con otro backend."""
+    backend = caches[REALTIME_CACHE]
+    if isinstance(backend, RedisCache):
+        return backend._cache.get_client(write=True), backend.make_and_validate_key(INDEX_KEY)
+    return None, None
+
+
+def _index():
+    client, key = _redis_index()
+    if client is not None:
+        return {m.decode() for m in client.smembers(key)}
+    return set(cache.get(INDEX_KEY) or ())
+
+
+def _index_add(user_id):
+    uid = str(user_id)
+    client, key = _redis_index()
+    if client is not None:
+        client.sadd(key, uid)
+        return
+    with _index_lock:
+        ids = _index()
+        if uid not in ids:
+            ids.add(uid)
+            cache.set(INDEX_KEY, ids, None)
+
+
+def _index_remove(user_ids):
+    uids = {str(u) for u in user_ids}
+    if not uids:
+        return
+    client, key = _redis_index()
+    if client is not None:
+        client.srem(key, *uids)
+        return
+    with _index_lock:
+        ids = _index()
+        if uids & ids:
+            cache.set(INDEX_KEY, ids - uids, None)
+
+
+# ---------------------------------------------------------------------------
+# API pública
+# ---------------------------------------------------------------------------
+
+def get_status(user_id):
+    if user_id is None:
+        return None
+    return cache.get(_key(user_id))
+
+
+def set_status(user_id, data):
+    """Reemplaza la entrada completa del agente y lo registra en el índice."""
+    key = _key(user_id)
+    with _locked(key):
+        cache.set(key, data, None)
+        _index_add(user_id)
+    if data.get("lastUpdate"):
+        touch_many({user_id: data["lastUpdate"]})
+    return data
+
+
+def update_status(user_id, defaults=None, **fields):
+    """
+    Mezcla ``fields`` en la entrada del agente de forma atómica (candado por
+    agente) y devuelve el dict resultante. ``defaults`` sólo rellena claves
+    que la entrada aún no tiene. Lanza ``StatusOcupado`` si no hay candado.
+    """
+    key = _key(user_id)
+    with _locked(key):
+        cur = cache.get(key) or {}
+        cur = {**(defaults or {}), **cur, **fields}
+        cache.set(key, cur, None)
+        # idempotente: repone al agente en el índice si faltara
+        _index_add(user_id)
+    if fields.get("lastUpdate"):
+        touch_many({user_id: fields["lastUpdate"]})
+    return cur
+
+
+def remove_status(user_id):
+    """
+    Elimina al agente. Devuelve la entrada eliminada (None si no existía).
+    Bajo el mismo candado que las escrituras: un cambio simultáneo no puede
+    dejar la entrada viva fuera del índice.
+    """
+    key = _key(user_id)
+    with _locked(key):
+        existed = cache.get(key)
+        cache.delete_many([key, _seen_key(user_id)])
+        _index_remove([user_id])
+    return existed
+
+
+def touch_many(beats, ts=None):
+    """
+    Registra señales de vida ``{userId: iso}`` en un solo ``set_many``.
+    No toca la entrada de estado, así que no compite con ``update_status``.
+    """
+    if not beats:
+        return
+    cache.set_many(
+        {_seen_key(u): _seen(iso, ts) for u, iso in beats.items()},
+        None,
+    )
+
+
+def stale_user_ids(older_than):
+    """userIds del índice cuya última señal de vida es anterior a ``older_than`` (epoch)."""
+    ids = _index()
+    if not ids:
+        return []
+    seen = cache.get_many([_seen_key(u) for u in ids])
+    stale = []
+    for u in ids:
+        s = seen.get(_seen_key(u))
+        if s is None or s.get("ts", 0) < older_than:
+            stale.append(u)
+    return stale
+
+
+def all_statuses():
+    """
+    Lectura en bloque de todos los agentes conectados (un solo ``get_many``).
+    ``lastUpdate`` refleja la última señal de vida registrada.
+    """
+    ids = _index()
+    if not ids:
+        return []
+    found = cache.get_many([_key(u) for u in ids] + [_seen_key(u) for u in ids])
+    # Limpia del índice entradas que expiraron o fueron borradas por fuera
+    missing = [u for u in ids if _key(u) not in found]
+    if missing:
+        _index_remove(missing)
+    users = []
+    for u in ids:
+        cur = found.get(_key(u))
+        if cur is None:
+            continue
+        seen = found.get(_seen_key(u))
+        if seen and seen.get("iso"):
+            cur["lastUpdate"] = seen["iso"]
+        users.append(cur)
+    return users
+
+
+# ---------------------------------------------------------------------------
+# Versiones async (consumer / heartbeats): se ejecutan fuera del event loop
+# ---------------------------------------------------------------------------
+
+aset_status = sync_to_async(set_status, thread_sensitive=False)
+aupdate_status = sync_to_async(update_status, thread_sensitive=False)
+aremove_status = sync_to_async(remove_status, thread_sensitive=False)
+atouch_many = sync_to_async(touch_many, thread_sensitive=False)
+astale_user_ids = sync_to_async(stale_user_ids, thread_sensitive=False)
+aall_statuses = sync_to_async(all_statuses, thread_sensitive=False)
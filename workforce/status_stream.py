@@ -0,0 +1,81 @@
+# workforce/status_stream.py
+"""
+Flujo versionado de cambios de estado para el panel del líder.
+
+Cada evento que se difunde a los líderes (``user_connected``, ``estado_cambio``,
+``user_disconnected``) recibe un número de secuencia global y monótono
+(``cache.incr``) y se guarda en un buffer circular de
+``WORKFORCE_STATUS_RING_SIZE`` posiciones. Un líder que se reconecta envía
+``request_all_status`` con ``since=<seq>`` y recibe sólo los deltas que se
+perdió; si el hueco ya no cabe en el buffer se le manda el snapshot completo.
+
+El contador y el buffer viven en el alias ``realtime`` (como status_store). Si
+el contador se pierde (Redis reiniciado, caché nueva) no vuelve a 0: se siembra
+con la hora en microsegundos, de modo que los seq nuevos siguen siendo mayores
+que los que ya tiene un líder y su ``since`` no devuelve deltas equivocados.
+"""
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from .status_store import cache
+
+SEQ_KEY = "workforce:statuses:seq"
+RING_PREFIX = "workforce:statuses:ring:"   # + (seq % ring_size)
+
+
+def ring_size():
+    return getattr(settings, "WORKFORCE_STATUS_RING_SIZE", 512)
+
+
+def _slot(seq):
+    return f"{RING_PREFIX}{seq % ring_size()}"
+
+
+def current_seq():
+    return cache.get(SEQ_KEY) or 0
+
+
+def _seed():
+    return int(time.time() * 1_000_000)
+
+
+def record(payload):
+    """Asigna el siguiente ``seq`` al evento, lo guarda en el buffer y lo devuelve."""
+    try:
+        seq = cache.incr(SEQ_KEY)
+    except ValueError:
+        # contador inexistente: sembrar (sólo gana un proceso) y reintentar
+        cache.add(SEQ_KEY, _seed(), None)
+        seq = cache.incr(SEQ_KEY)
+    event = {**payload, "seq": seq}
+    cache.set(_slot(seq), event, None)
+    return event
+
+
+def deltas_since(since):
+    """
+    Eventos con ``seq > since`` en orden. Devuelve None si el hueco es mayor
+    que el buffer (o falta alguna posición) y hace falta un snapshot.
+    """
+    cur = current_seq()
+    if since < 0 or since > cur or cur - since > ring_size():
+        return None
+    if cur == since:
+        return []
+    seqs = range(since + 1, cur + 1)
+    found = cache.get_many([_slot(s) for s in seqs])
+    events = []
+    for s in seqs:
+        event = found.get(_slot(s))
+        if not event or event.get("seq") != s:
+            return None  # posición sobrescrita o aún no escrita
+        events.append(event)
+    return events
+
+
+# Versiones async para el consumer (fuera del event loop, ver status_store)
+arecord = sync_to_async(record, thread_sensitive=False)
+acurrent_seq = sync_to_async(current_seq, thread_sensitive=False)
+adeltas_since = sync_to_async(deltas_since, thread_sensitive=False)
@@ -1,3 +1,318 @@
-from django.test import TestCase
+import importlib
+import json
+import os
+import socket
+import subprocess
+import sys
+import threading
+import unittest
+from datetime import datetime, timedelta
+from types import SimpleNamespace
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from channels.testing import WebsocketCommunicator
+from django.apps import apps
+from django.conf import settings
+from django.db import connections, router
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings, skipUnlessDBFeature
+from django.utils import timezone
+
+from accounts.utils import make_tokens
+
+from . import catalogo, status_store, status_stream
+from .consumers import RealtimeConsumer
+from .models import Asesor, EstadoTipo, JornadaEstado, UsoDiarioEstado
+from .services import _partir_por_dia, acumular_uso_diario, reconstruir_uso_diario, transicionar_estado
+
+try:
+    from fakeredis import TcpFakeServer
+except ImportError:  # pragma: no cover - dependencia sólo de pruebas
+    TcpFakeServer = None
+
+
+@skipUnlessDBFeature("has_select_for_update")
+class TransicionesConcurrentesTests(TransactionTestCase):
+    """
+    transicionar_estado bajo concurrencia: 6 hilos x 10 transiciones sobre el
+    mismo asesor (doble clic, WS + HTTP) nunca dejan dos tramos abiertos.
+    """
+    databases = {"default", "database_HRS"}
+
+    HILOS = 6
+    POR_HILO = 10
+    SLUGS = ["break", "disponible", "reunion", "almuerzo"]
+
+    def setUp(self):
+        for i, slug in enumerate(self.SLUGS):
+            EstadoTipo.objects.create(slug=slug, nombre=slug, orden=i)
+        self.asesor = Asesor.objects.create(id_asesor=7, nombre="Asesor 7")
+
+    def test_un_solo_tramo_abierto(self):
+        errores = []
+
+        def trabajar(n):
+            try:
+                for k in range(self.POR_HILO):
+                    transicionar_estado(self.asesor, self.SLUGS[(n + k) % len(self.SLUGS)])
+            except Exception as e:
+                errores.append(e)
+            finally:
+                connections.close_all()
+
+        hilos = [threading.Thread(target=trabajar, args=(i,)) for i in range(self.HILOS)]
+        for h in hilos:
+            h.start()
+        for h in hilos:
+            h.join()
+
+        self.assertEqual(errores, [])
+        tramos = list(JornadaEstado.objects.filter(asesor=self.asesor).order_by("inicio", "id"))
+        self.assertEqual(sum(1 for t in tramos if t.fin is None), 1)
+        # cada tramo cerrado termina donde empieza el siguiente (sin solapes)
+        for anterior, siguiente in zip(tramos, tramos[1:]):
+            self.assertIsNotNone(anterior.fin)
+            self.assertLessEqual(anterior.fin, siguiente.inicio)
+
+
+@override_settings(WORKFORCE_CATALOGO_CHECK_SECONDS=0)
+class CatalogoCacheLocalTests(TestCase):
+    """
+    Con la caché ``default`` por proceso (LocMem en tests) otro worker no sube
+    la versión que vemos: el catálogo se recarga por tiempo.
+    """
+    databases = {"default", "database_HRS"}
+
+    def setUp(self):
+        self.estado = EstadoTipo.objects.create(slug="break", nombre="Break", orden=0)
+        catalogo.invalidar()
+        self.addCleanup(catalogo.invalidar)
+
+    def _escritura_de_otro_proceso(self):
+        # update() no dispara post_save: nadie sube la versión
+        EstadoTipo.objects.filter(pk=self.estado.pk).update(nombre="Pausa")
+
+    @override_settings(CACHE_LOCAL_MAX_TTL=3600)
+    def test_dentro_del_ttl_usa_la_copia(self):
+        self.assertEqual(catalogo.estado_por_slug("break").nombre, "Break")
+        self._escritura_de_otro_proceso()
+        self.assertEqual(catalogo.estado_por_slug("break").nombre, "Break")
+
+    @override_settings(CACHE_LOCAL_MAX_TTL=0)
+    def test_recarga_por_tiempo(self):
+        self.assertEqual(catalogo.estado_por_slug("break").nombre, "Break")
+        self._escritura_de_otro_proceso()
+        self.assertEqual(catalogo.estado_por_slug("break").nombre, "Pausa")
+
+
+class UsoDiarioTests(TestCase):
+    """
+    El acumulado diario sale igual por las tres vías: incremental al cerrar
+    tramos, ``reconstruir_uso_diario`` y el relleno de la migración 0012.
+    """
+    databases = {"default", "database_HRS"}
+
+    def setUp(self):
+        self.dia = timezone.localdate() - timedelta(days=2)
+        self.siguiente = self.dia + timedelta(days=1)
+        self.asesor = Asesor.objects.create(id_asesor=7, nombre="Asesor 7")
+        self.brk = EstadoTipo.objects.create(slug="break", nombre="Break", orden=0)
+        self.alm = EstadoTipo.objects.create(slug="almuerzo", nombre="Almuerzo", orden=1)
+        self.tramos = [
+            # cruza la medianoche: 2h el primer día, 1h30 el segundo
+            self._tramo(self.brk, self.dia, "22:00", self.siguiente, "01:30"),
+            self._tramo(self.brk, self.siguiente, "08:00", self.siguiente, "08:10"),
+            self._tramo(self.alm, self.dia, "10:00", self.dia, "10:30"),
+        ]
+        self.esperado = {
+            (self.dia, self.brk.id): (7200, 1),
+            (self.siguiente, self.brk.id): (5400 + 600, 1),  # el tramo partido no cuenta otra vez
+            (self.dia, self.alm.id): (1800, 1),
+        }
+
+    def _tramo(self, estado, dia_inicio, hora_inicio, dia_fin, hora_fin):
+        def local(dia, hora):
+            return timezone.make_aware(datetime.combine(dia, datetime.strptime(hora, "%H:%M").time()))
+        return JornadaEstado.objects.create(
+            asesor=self.asesor, estado=estado,
+            inicio=local(dia_inicio, hora_inicio), fin=local(dia_fin, hora_fin),
+        )
+
+    def _uso(self):
+        return {
+            (u.fecha, u.estado_id): (u.segundos, u.transiciones)
+            for u in UsoDiarioEstado.objects.filter(asesor=self.asesor)
+        }
+
+    def test_partir_por_dia_en_medianoche(self):
+        tramo = self.tramos[0]
+        self.assertEqual(list(_partir_por_dia(tramo.inicio, tramo.fin)),
+                         [(self.dia, 7200), (self.siguiente, 5400)])
+
+    def test_incremental_y_reconstruccion_coinciden(self):
+        for tramo in self.tramos:
+            acumular_uso_diario(tramo)
+        self.assertEqual(self._uso(), self.esperado)
+
+        self.assertEqual(reconstruir_uso_diario(self.dia, self.siguiente), 3)
+        self.assertEqual(self._uso(), self.esperado)
+
+    def test_relleno_de_la_migracion(self):
+        migracion = importlib.import_module("workforce.migrations.0012_usodiarioestado")
+        db = router.db_for_write(UsoDiarioEstado)
+        migracion.rellenar_uso_diario(apps, SimpleNamespace(connection=connections[db]))
+        self.assertEqual(self._uso(), self.esperado)
+
+
+@override_settings(WORKFORCE_STATUS_RING_SIZE=4)
+class StatusStreamTests(SimpleTestCase):
+    """Deltas por ``since`` y caída a snapshot (None) cuando no se pueden servir."""
+
+    def setUp(self):
+        status_stream.cache.clear()
+        self.addCleanup(status_stream.cache.clear)
+
+    def test_deltas_en_orden(self):
+        eventos = [status_stream.record({"userId": i}) for i in range(3)]
+        since = eventos[0]["seq"]
+        self.assertEqual(status_stream.deltas_since(since), eventos[1:])
+        self.assertEqual(status_stream.deltas_since(eventos[-1]["seq"]), [])
+
+    def test_contador_perdido_se_resiembra_por_encima(self):
+        viejo = status_stream.record({"userId": 1})["seq"]
+        status_stream.cache.clear()  # Redis reiniciado
+        nuevo = status_stream.record({"userId": 2})["seq"]
+        self.assertGreater(nuevo, viejo)
+        # el líder con el seq viejo no recibe deltas equivocados: snapshot
+        self.assertIsNone(status_stream.deltas_since(viejo))
+
+    def test_hueco_mayor_que_el_buffer(self):
+        primero = status_stream.record({"userId": 0})["seq"]
+        for i in range(status_stream.ring_size()):
+            status_stream.record({"userId": i})
+        # faltan ring_size + 1 eventos: no caben en el buffer
+        self.assertIsNone(status_stream.deltas_since(primero - 1))
+        # justo ring_size: se sirven todos
+        self.assertEqual(len(status_stream.deltas_since(primero)), status_stream.ring_size())
+
+    def test_posicion_sobrescrita(self):
+        eventos = [status_stream.record({"userId": i}) for i in range(3)]
+        # otra escritura ocupó la posición del segundo evento
+        intruso = {"userId": 99, "seq": eventos[1]["seq"] + status_stream.ring_size()}
+        status_stream.cache.set(status_stream._slot(eventos[1]["seq"]), intruso, None)
+        self.assertIsNone(status_stream.deltas_since(eventos[0]["seq"]))
+
+    def test_posicion_aun_no_escrita(self):
+        eventos = [status_stream.record({"userId": i}) for i in range(2)]
+        # incr ya hecho por otro proceso que todavía no guardó su evento
+        status_stream.cache.incr(status_stream.SEQ_KEY)
+        self.assertIsNone(status_stream.deltas_since(eventos[0]["seq"]))
+        self.assertIsNone(status_stream.deltas_since(eventos[0]["seq"] - 10))
+
+
+class LiderConTokenTests(SimpleTestCase):
+    """identify_leader con un access token emitido por el login (sub numérico en BD)."""
+
+    def setUp(self):
+        status_store.cache.clear()
+        self.addCleanup(status_store.cache.clear)
+
+    async def _eventos(self, token):
+        """userIds que recibe un líder con ``token`` al conectarse agentes de las sedes 1 y 2."""
+        lider = WebsocketCommunicator(RealtimeConsumer.as_asgi(), "/ws/realtime/")
+        await lider.connect()
+        await lider.send_json_to({"type": "identify_leader", "token": token})
+        agentes = []
+        for user_id, sede in ((1, 1), (2, 2)):
+            ws = WebsocketCommunicator(RealtimeConsumer.as_asgi(), "/ws/realtime/")
+            await ws.connect()
+            await ws.send_json_to({"type": "identify_agent", "userId": user_id, "id_sede": sede})
+            agentes.append(ws)
+        recibidos = []
+        while not await lider.receive_nothing(0.2):
+            recibidos.append((await lider.receive_json_from())["userId"])
+        for ws in [lider, *agentes]:
+            await ws.disconnect()
+        return recibidos
+
+    def test_token_del_login_filtra_por_sede(self):
+        access, _ = make_tokens({"sub": 15, "username": "lider", "rol": "lider", "id_sede": 1})
+        self.assertEqual(async_to_sync(self._eventos)(access), [1])
+
+    def test_token_invalido_usa_grupo_global(self):
+        self.assertEqual(async_to_sync(self._eventos)("no-es-un-jwt"), [1, 2])
+
+
+# Proceso hijo del test multi-proceso: un líder o un agente del RealtimeConsumer
+# contra el Redis de REDIS_URL (channel layer + caché compartidos).
+_HIJO = r"""
+import asyncio, json, sys
+import django
+django.setup()
+from channels.testing import WebsocketCommunicator
+from workforce.consumers import RealtimeConsumer
+
+async def main(rol):
+    ws = WebsocketCommunicator(RealtimeConsumer.as_asgi(), "/ws/realtime/")
+    await ws.connect()
+    if rol == "leader":
+        await ws.send_json_to({"type": "identify_leader"})
+        await asyncio.sleep(0.5)
+        print("ready", flush=True)
+        evento = await ws.receive_json_from(10)
+        await ws.send_json_to({"type": "request_all_status"})
+        snapshot = await ws.receive_json_from(5)
+        print(json.dumps({"evento": evento, "snapshot": snapshot}), flush=True)
+    else:
+        await ws.send_json_to({"type": "identify_agent", "userId": 42, "nombre": "Agente"})
+        await asyncio.sleep(1)
+    await ws.disconnect()
+
+asyncio.run(main(sys.argv[1]))
+"""
+
+
+@unittest.skipIf(TcpFakeServer is None, "requiere fakeredis")
+class MultiProcesoRedisTests(TransactionTestCase):
+    """
+    Dos procesos comparten grupos de líderes y estados vía Redis (REDIS_URL):
+    el líder de un proceso ve al agente que se conecta en el otro.
+    """
+    databases = set()
+
+    def setUp(self):
+        with socket.socket() as s:
+            s.bind(("127.0.0.1", 0))
+            self.puerto = s.getsockname()[1]
+        self.servidor = TcpFakeServer(("127.0.0.1", self.puerto), server_type="redis")
+        threading.Thread(target=self.servidor.serve_forever, daemon=True).start()
+        self.addCleanup(self.servidor.server_close)
+        self.addCleanup(self.servidor.shutdown)
+
+    def _hijo(self, rol):
+        env = {
+            **os.environ,
+            "REDIS_URL": f"redis://127.0.0.1:{self.puerto}/0",
+            "DJANGO_SETTINGS_MODULE": os.environ.get("DJANGO_SETTINGS_MODULE", "core.settings"),
+            "PYTHONPATH": os.pathsep.join([str(settings.BASE_DIR), os.environ.get("PYTHONPATH", "")]),
+        }
+        return subprocess.Popen(
+            [sys.executable, "-c", _HIJO, rol],
+            cwd=settings.BASE_DIR, env=env, text=True,
+            stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+        )
+
+    def test_lider_ve_agente_de_otro_proceso(self):
+        lider = self._hijo("leader")
+        self.addCleanup(lider.kill)
+        self.assertEqual(lider.stdout.readline().strip(), "ready")
+
+        agente = self._hijo("agent")
+        self.assertEqual(agente.wait(30), 0)
+        salida, _ = lider.communicate(timeout=30)
+        self.assertEqual(lider.returncode, 0)
+
+        datos = json.loads(salida.strip().splitlines()[-1])
+        self.assertEqual(datos["evento"]["type"], "user_connected")
+        self.assertEqual(datos["evento"]["userId"], 42)
+        self.assertEqual(datos["snapshot"]["type"], "all_status")
+        self.assertIn(42, [u["userId"] for u in datos["snapshot"]["users"]])
@@ -18,6 +18,9 @@ router.register(r"estado-config", EstadoConfigAsesorViewSet, basename="estado-co
 # 👇 acciones por asesor
 asesor_states    = AsesorEstadosViewSet.as_view({"get": "estados"})
 asesor_trans     = AsesorEstadosViewSet.as_view({"post": "transiciones"})
+asesor_trans_bulk = AsesorEstadosViewSet.as_view({"post": "transiciones_masivas"})
+asesores_status  = AsesorEstadosViewSet.as_view({"get": "status_equipo"})
+asesor_provisionar = AsesorEstadosViewSet.as_view({"post": "provisionar"})
 asesor_status    = AsesorEstadosViewSet.as_view({"get": "status"})
 asesor_jornada   = AsesorEstadosViewSet.as_view({"get": "jornada"})
 asesor_historial = AsesorEstadosViewSet.as_view({"get": "historial"})
@@ -36,11 +39,14 @@ urlpatterns = [
     path("", include(router.urls)),
 
     # --- rutas manuales de asesor ---
+    path("asesores/transiciones/", asesor_trans_bulk, name="asesores-transiciones"),
+    path("asesores/status/", asesores_status, name="asesores-status"),
     path("asesores/<int:asesor_id>/estados/", asesor_states, name="asesor-estados"),
     path("asesores/<int:asesor_id>/transiciones/", asesor_trans, name="asesor-transiciones"),
     path("asesores/<int:asesor_id>/status/", asesor_status, name="asesor-status"),
     path("asesores/<int:asesor_id>/jornada/", asesor_jornada, name="asesor-jornada"),  # GET
     path("asesores/<int:asesor_id>/historial/", asesor_historial, name="asesor-historial"),
+    path("asesores/<int:asesor_id>/provisionar/", asesor_provisionar, name="asesor-provisionar"),
     path("asesores/<str:asesor_id>/horario-actual/", horario_actual_asesor, name="asesor-horario-actual"),
 
     path("asesores/<int:asesor_id>/jornada/entrada/", marcar_entrada, name="jornada-entrada"),
@@ -3,18 +3,17 @@ from rest_framework.response import Response
 from rest_framework import status
 from django.views.decorators.http import require_GET
 from django.utils.decorators import method_decorator
-from django.core.cache import cache
 from django.http import JsonResponse
 from .models import Solicitud, AsignacionHorario, AsignacionHorario
 from .serializers import SolicitudSerializer, AsignacionHorarioSerializer
 from .utils import require_app_secret, csv_response
+from . import status_store
+from core.dbrouters import escritura_reciente, marcar_escritura, usar_primario
 
 from django.utils import timezone
 from rest_framework.decorators import api_view
 from datetime import date
 
-STATUS_KEY = "workforce:statuses"
-
 
 class SolicitudesList(APIView):
     def get(self, request):
@@ -22,6 +21,13 @@ class SolicitudesList(APIView):
         if not ok:
             return resp
 
+        # justo después de crear/aprobar/rechazar, leer del primario
+        if escritura_reciente("solicitudes"):
+            with usar_primario():
+                return self._listar(request)
+        return self._listar(request)
+
+    def _listar(self, request):
         qs = Solicitud.objects.all().order_by('-id')
 
         estado = request.query_params.get('estado')
@@ -45,6 +51,7 @@ class SolicitudesList(APIView):
         ser = SolicitudSerializer(data=request.data)
         ser.is_valid(raise_exception=True)
         s = ser.save()
+        marcar_escritura("solicitudes")
         return Response(SolicitudSerializer(s).data, status=status.HTTP_201_CREATED)
 
 
@@ -60,6 +67,7 @@ class AprobarSolicitud(APIView):
         
         s.estado = 'Aprobado'
         s.save()
+        marcar_escritura("solicitudes")
         return Response(SolicitudSerializer(s).data)
 
 
@@ -80,6 +88,7 @@ class RechazarSolicitud(APIView):
         s.estado = 'Rechazado'
         s.razonRechazo = razon
         s.save()
+        marcar_escritura("solicitudes")
         return Response(SolicitudSerializer(s).data)
 
 
@@ -193,7 +202,7 @@ def export_asesores(request):
     ok, resp = require_app_secret(request)
     if not ok: return resp
     
-    estados = list((cache.get(STATUS_KEY, {}) or {}).values())
+    estados = status_store.all_statuses()
     headers = ['userId', 'nombre', 'cargo', 'area', 'estado', 'lastUpdate']
     return csv_response('asesores.csv', estados, headers)
 
@@ -9,12 +9,16 @@ from rest_framework.response import Response
 
 from .models import Asesor, EstadoTipo, EstadoConfigAsesor, JornadaEstado, AsignacionHorario, JornadaLaboral
 from .serializers import (
-    EstadoTipoSerializer, EstadoConfigAsesorSerializer, JornadaEstadoSerializer, JornadaLaboralSerializer 
+    EstadoTipoSerializer, EstadoConfigAsesorSerializer, EstadoConfigBulkSerializer,
+    JornadaEstadoSerializer, JornadaLaboralSerializer
 )
 from .services import (
-    transicionar_estado, limite_minutos_resuelto, tiempo_usado_hoy_min,
-    color_resuelto, _hoy_range
+    transicionar_estado, transicionar_estados,
+    color_resuelto, config_asesor, estado_equipo, uso_estados_hoy, _hoy_range,
+    asesor_por_id, provisionar_asesor, provisionar_configs
 )
+from . import catalogo
+from core.dbrouters import escritura_reciente, usar_primario
 from rest_framework import status
 
 
@@ -41,6 +45,8 @@ class EstadoConfigAsesorViewSet(viewsets.ModelViewSet):
     Vista para gestionar configuraciones de estados por asesor.
     Si no se envía 'limite_minutos', se tomará automáticamente desde
     EstadoTipo.limite_minutos_default gracias al método save() del modelo.
+
+    POST /estado-config/bulk/ da de alta una matriz asesores × estados de una vez.
     """
     queryset = (
         EstadoConfigAsesor.objects
@@ -74,37 +80,83 @@ class EstadoConfigAsesorViewSet(viewsets.ModelViewSet):
 
         return qs
 
+    @action(detail=False, methods=["post"], url_path="bulk")
+    def bulk(self, request, *args, **kwargs):
+        ser = EstadoConfigBulkSerializer(data=request.data)
+        ser.is_valid(raise_exception=True)
+        data = ser.validated_data
+        resultado = provisionar_configs(
+            data.get("asesores"),
+            data["estados"],
+            id_sede=data.get("id_sede"),
+            activo=data["activo"],
+            color_hex_override=data.get("color_hex_override"),
+        )
+        return Response(resultado, status=status.HTTP_200_OK)
+
 
 class AsesorEstadosViewSet(viewsets.GenericViewSet):
     """
     Endpoints por asesor:
       - GET  /asesores/{asesor_id}/estados/
       - POST /asesores/{asesor_id}/transiciones/
+      - POST /asesores/transiciones/  (masiva: {"asesores": [ids], "estado": slug})
+      - GET  /asesores/status/?id_sede=3 | ?ids=1,2,3  (equipo, sólo tramos abiertos)
       - GET  /asesores/{asesor_id}/status/
       - GET  /asesores/{asesor_id}/jornada/?date=YYYY-MM-DD
+      - POST /asesores/{asesor_id}/provisionar/  (alta idempotente con datos del ERP)
+
+    Los GET no escriben: para un asesor aún no registrado responden vacío
+    (sin estado, sin tramos, límites del catálogo) hasta que su primera
+    transición (o /provisionar/) lo da de alta.
     """
     queryset = Asesor.objects.all()
     lookup_field = "id_asesor"        # campo del modelo
     lookup_url_kwarg = "asesor_id"    # nombre del kwarg en la URL
 
+    def dispatch(self, request, *args, **kwargs):
+        # leer lo recién escrito (transición/provisión) aunque la réplica vaya atrasada
+        asesor_id = kwargs.get(self.lookup_url_kwarg)
+        if asesor_id is not None and escritura_reciente(f"asesor:{asesor_id}"):
+            with usar_primario():
+                return super().dispatch(request, *args, **kwargs)
+        return super().dispatch(request, *args, **kwargs)
+
     def get_object(self):
-        asesor_id = self.kwargs.get(self.lookup_url_kwarg)
-        obj, _ = Asesor.objects.get_or_create(id_asesor=asesor_id)
-        return obj
+        """El Asesor, o None si aún no está registrado (sin escribir)."""
+        return asesor_por_id(self.kwargs.get(self.lookup_url_kwarg))
+
+    @action(detail=True, methods=["post"], url_path="provisionar")
+    def provisionar(self, request, *args, **kwargs):
+        id_sede = request.data.get("id_sede")
+        if id_sede not in (None, "") and not str(id_sede).isdigit():
+            return Response({"detail": "id_sede debe ser numérico"}, status=400)
+        asesor, created = provisionar_asesor(
+            int(self.kwargs[self.lookup_url_kwarg]),
+            id_sede_preferida=int(id_sede) if id_sede not in (None, "") else None,
+        )
+        return Response({
+            "asesor": asesor.id_asesor,
+            "nombre": asesor.nombre,
+            "cargo": asesor.cargo,
+            "id_sede": asesor.id_sede,
+            "created": created,
+        }, status=201 if created else 200)
 
     @action(detail=True, methods=["get"], url_path="estados")
     def estados(self, request, *args, **kwargs):
         asesor = self.get_object()
-        estados = EstadoTipo.objects.filter(activo=True).order_by("orden", "slug")
+        estados = catalogo.estados_activos()
+        uso = uso_estados_hoy(asesor, estados)
         data = []
         for e in estados:
-            limite = limite_minutos_resuelto(asesor, e)
-            usado = tiempo_usado_hoy_min(asesor, e)
+            limite = uso[e.id]["limite"]
+            usado = uso[e.id]["usado"]
             restante = None if limite is None else max(0, limite - usado)
             data.append({
                 "slug": e.slug,
                 "nombre": e.nombre,
-                "color": color_resuelto(asesor, e),
+                "color": uso[e.id]["color"],
                 "icon": e.icon,
                 "orden": e.orden,
                 "limite_minutos": limite,
@@ -115,7 +167,7 @@ class AsesorEstadosViewSet(viewsets.GenericViewSet):
 
     @action(detail=True, methods=["post"], url_path="transiciones")
     def transiciones(self, request, *args, **kwargs):
-        asesor = self.get_object()
+        asesor, _ = provisionar_asesor(int(self.kwargs[self.lookup_url_kwarg]))
         slug = request.data.get("estado")
         meta = request.data.get("meta") or {}
         if not slug:
@@ -126,22 +178,58 @@ class AsesorEstadosViewSet(viewsets.GenericViewSet):
             return Response({"detail": str(e)}, status=400)
         return Response(JornadaEstadoSerializer(j).data, status=201 if created else 200)
 
+    @action(detail=False, methods=["post"], url_path="transiciones")
+    def transiciones_masivas(self, request, *args, **kwargs):
+        slug = request.data.get("estado")
+        ids = request.data.get("asesores")
+        meta = request.data.get("meta") or {}
+        if not slug:
+            return Response({"detail": "estado (slug) requerido"}, status=400)
+        if not isinstance(ids, list) or not ids:
+            return Response({"detail": "asesores (lista de ids) requerido"}, status=400)
+        try:
+            ids = [int(i) for i in ids]
+        except (TypeError, ValueError):
+            return Response({"detail": "asesores debe ser una lista de ids numéricos"}, status=400)
+        try:
+            resultados = transicionar_estados(ids, slug, meta)
+        except ValueError as e:
+            return Response({"detail": str(e)}, status=400)
+        return Response({"estado": slug.strip().lower(), "resultados": resultados})
+
     @action(detail=True, methods=["get"], url_path="status")
     def status(self, request, *args, **kwargs):
         asesor = self.get_object()
         abierto = (JornadaEstado.objects
                    .filter(asesor=asesor, fin__isnull=True)
-                   .select_related("estado")
-                   .first())
-        if not abierto:
+                   .first()) if asesor is not None else None
+        if asesor is None or not abierto:
             return Response({"estado": None})
+        estado = catalogo.estado_por_id(abierto.estado_id)
         return Response({
-            "estado": abierto.estado.slug,
-            "nombre": abierto.estado.nombre,
-            "color": color_resuelto(asesor, abierto.estado),
+            "estado": estado.slug,
+            "nombre": estado.nombre,
+            "color": color_resuelto(asesor, estado),
             "inicio": abierto.inicio,
         })
 
+    @action(detail=False, methods=["get"], url_path="status")
+    def status_equipo(self, request, *args, **kwargs):
+        id_sede = request.query_params.get("id_sede")
+        ids = request.query_params.get("ids")
+        if not id_sede and not ids:
+            return Response({"detail": "id_sede o ids requerido"}, status=400)
+        if id_sede and not id_sede.isdigit():
+            return Response({"detail": "id_sede debe ser numérico"}, status=400)
+        if ids:
+            ids = [i.strip() for i in ids.split(",") if i.strip()]
+            if not all(i.isdigit() for i in ids):
+                return Response({"detail": "ids debe ser una lista de ids numéricos separados por coma"}, status=400)
+        return Response(estado_equipo(
+            id_sede=int(id_sede) if id_sede else None,
+            ids_asesor=[int(i) for i in ids] if ids else None,
+        ))
+
     @action(detail=True, methods=["get"], url_path="jornada")
     def jornada(self, request, *args, **kwargs):
         asesor = self.get_object()
@@ -153,26 +241,35 @@ class AsesorEstadosViewSet(viewsets.GenericViewSet):
         else:
             start, end = _hoy_range()
 
+        if asesor is None:
+            return Response({
+                "asesor_id": int(self.kwargs[self.lookup_url_kwarg]),
+                "fecha": start.date().isoformat(),
+                "total_seg": 0,
+                "items": [],
+            })
+
         # SOLO registros que iniciaron ese día
         logs = (JornadaEstado.objects
                 .filter(asesor=asesor)
                 .filter(inicio__gte=start, inicio__lt=end)
-                .select_related("estado")
                 .order_by("inicio"))
 
+        cfg = config_asesor(asesor)
         total_seg = 0
         rows = []
         now = timezone.now()
         for j in logs:
+            estado = catalogo.estado_por_id(j.estado_id)
             i = j.inicio
             f = j.fin or now
             seg = max(0, int((f - i).total_seconds()))
             total_seg += seg
             rows.append({
                 "id": j.id,
-                "estado": j.estado.slug,
-                "nombre": j.estado.nombre,
-                "color": color_resuelto(asesor, j.estado),
+                "estado": estado.slug,
+                "nombre": estado.nombre,
+                "color": cfg.color(estado),
                 "inicio": j.inicio.isoformat(),
                 "fin": j.fin.isoformat() if j.fin else None,
                 "segundos": seg,
@@ -201,26 +298,34 @@ class AsesorEstadosViewSet(viewsets.GenericViewSet):
         else:
             start, end = _hoy_range()
 
+        if asesor is None:
+            return Response({
+                "asesor_id": int(self.kwargs[self.lookup_url_kwarg]),
+                "fecha": start.date().isoformat(),
+                "transiciones": [],
+            })
+
         logs = (JornadaEstado.objects
                 .filter(asesor=asesor, inicio__lt=end)
                 .filter(Q(fin__gt=start) | Q(fin__isnull=True))
-                .select_related("estado")
                 .order_by("inicio"))
 
+        cfg = config_asesor(asesor)
         data = []
         for j in logs:
+            estado = catalogo.estado_por_id(j.estado_id)
             local_inicio = timezone.localtime(j.inicio)
             local_fin = timezone.localtime(j.fin) if j.fin else None
 
             data.append({
-                "estado": j.estado.nombre,
-                "slug": j.estado.slug,
+                "estado": estado.nombre,
+                "slug": estado.slug,
                 "inicio": local_inicio.strftime("%Y-%m-%d %H:%M:%S"),
                 "fin": local_fin.strftime("%Y-%m-%d %H:%M:%S") if local_fin else None,
                 "duracion_seg": j.duracion_seg,
                 "limite_minutos": j.limite_minutos,
                 "diferencia_minutos": j.diferencia_minutos,
-                "color": color_resuelto(asesor, j.estado),
+                "color": cfg.color(estado),
             })
 
         return Response({
@@ -0,0 +1,111 @@
+# workforce/ws_encoding.py
+"""
+Codificación de los frames que envía el RealtimeConsumer, negociada por conexión
+(``?encoding=`` o campo ``encoding`` en ``identify_*``):
+
+- ``json``    (por defecto) el dict tal cual, como texto JSON.
+- ``compact`` claves cortas (``SHORT_KEYS``) y, por cada userId, sólo los
+  campos que cambiaron respecto a lo último que se envió por esa conexión. Los
+  datos estáticos (nombre, cargo, área, sede) viajan una vez en
+  ``user_connected`` / snapshot y luego sólo id + cambios.
+- ``msgpack`` el mismo esquema compacto empaquetado en MessagePack (frame binario).
+"""
+import json
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - viene con channels-redis
+    msgpack = None
+
+SHORT_KEYS = {
+    "type": "t",
+    "userId": "u",
+    "nombre": "n",
+    "cargo": "c",
+    "area": "a",
+    "id_sede": "s",
+    "estado": "e",
+    "lastUpdate": "l",
+    "seq": "q",
+    "users": "us",
+    "events": "ev",
+    "since": "si",
+}
+ALWAYS_SENT = ("type", "userId", "seq")
+
+
+def _short(obj):
+    return {SHORT_KEYS.get(k, k): v for k, v in obj.items()}
+
+
+class JsonEncoding:
+    name = "json"
+
+    def encode(self, obj):
+        """Devuelve ``(text_data, bytes_data)`` listo para ``send``."""
+        return json.dumps(obj), None
+
+    def decode(self, text_data=None, bytes_data=None):
+        return json.loads(text_data or "{}")
+
+
+class CompactEncoding(JsonEncoding):
+    name = "compact"
+
+    def __init__(self):
+        self._known = {}   # userId -> último estado enviado por esta conexión
+
+    def _agent(self, agente, full=False):
+        uid = agente.get("userId")
+        if agente.get("type") == "user_disconnected":
+            self._known.pop(uid, None)
+            return _short({k: agente[k] for k in ALWAYS_SENT if k in agente})
+        known = self._known.get(uid)
+        if full or known is None or agente.get("type") == "user_connected":
+            self._known[uid] = {k: v for k, v in agente.items() if k not in ALWAYS_SENT}
+            return _short(agente)
+        out = {k: agente[k] for k in ALWAYS_SENT if k in agente}
+        for k, v in agente.items():
+            if k not in ALWAYS_SENT and known.get(k) != v:
+                out[k] = v
+                known[k] = v
+        return _short(out)
+
+    def compact(self, obj):
+        if "users" in obj:
+            # snapshot: reinicia lo conocido y manda cada agente completo
+            self._known = {}
+            obj = {**obj, "users": [self._agent(u, full=True) for u in obj["users"]]}
+        if "events" in obj:
+            obj = {**obj, "events": [self._agent(e) for e in obj["events"]]}
+        if "userId" in obj:
+            return self._agent(obj)
+        return _short(obj)
+
+    def encode(self, obj):
+        return json.dumps(self.compact(obj), separators=(",", ":")), None
+
+
+class MsgpackEncoding(CompactEncoding):
+    name = "msgpack"
+
+    def encode(self, obj):
+        return None, msgpack.packb(self.compact(obj), use_bin_type=True)
+
+    def decode(self, text_data=None, bytes_data=None):
+        if bytes_data is not None:
+            return msgpack.unpackb(bytes_data, raw=False)
+        return super().decode(text_data)
+
+
+ENCODINGS = {
+    "json": JsonEncoding,
+    "compact": CompactEncoding,
+}
+if msgpack is not None:
+    ENCODINGS["msgpack"] = MsgpackEncoding
+
+
+def get_encoding(name):
+    """Instancia la codificación pedida; cae a JSON si no se conoce."""
+    return ENCODINGS.get((name or "").lower(), JsonEncoding)()